@@ -1,14 +1,17 @@
-from queue import Queue
-from typing import Optional
+import json
+from queue import Empty, Queue
+from time import monotonic
+from typing import Iterator, Optional
+from uuid import uuid4
 import uvicorn
 from corethread import StoppableThread
 from fastapi import FastAPI, Request, Depends
 from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from yanko.core import log_level
 from yanko.core.config import app_config
-from corestring import string_hash
-import time
+from yanko.core.trace import LatencyTrace
 import logging
 from yanko.sonic import Command
 from yanko.sonic.beats import Beats
@@ -31,10 +34,17 @@ class ServerMeta(type):
             cls._instance = type.__call__(cls, *args, **kwds)
         return cls._instance
 
-    def queue(cls, queue_id) -> Queue:
-        if queue_id not in cls._queue:
-            cls._queue[queue_id] = Queue()
-        return cls._queue[queue_id]
+    def open(cls) -> tuple[str, Queue]:
+        queue_id = uuid4().hex
+        cls._queue[queue_id] = Queue()
+        return queue_id, cls._queue[queue_id]
+
+    def close(cls, queue_id):
+        cls._queue.pop(queue_id, None)
+
+    def respond(cls, queue_id, data: dict):
+        if queue := cls._queue.get(queue_id):
+            queue.put_nowait(data)
 
     @property
     def app(cls) -> FastAPI:
@@ -47,6 +57,8 @@ class Server(StoppableThread, metaclass=ServerMeta):
     server: Optional[uvicorn.Server]
     config_vars = ["host", "port", "threadpool_workers"]
 
+    SEARCH_TIMEOUT = 30
+
     def __init__(self, *args, **kwargs):
         self.app = FastAPI()
         super().__init__(*args, **kwargs)
@@ -80,16 +92,48 @@ class Server(StoppableThread, metaclass=ServerMeta):
             self.server.should_exit = True
 
     def search(self, query):
-        queue_id = string_hash(query)
-        queue = __class__.queue(queue_id)
+        queue_id, queue = self.__query(query)
+        try:
+            for res in self.__results(queue_id, queue):
+                if "items" in res:
+                    return {"items": res.get("items", [])}
+            logging.warning(f"search for {query} timed out")
+            return {"items": []}
+        finally:
+            LatencyTrace.end(f"search:{queue_id}")
+            __class__.close(queue_id)
+
+    def search_stream(self, query) -> Iterator[str]:
+        """NDJSON lines, the items with the icons that were cached already,
+        then one line per icon as it is resolved and a done line."""
+        queue_id, queue = self.__query(query)
+        try:
+            for res in self.__results(queue_id, queue):
+                if "items" in res:
+                    LatencyTrace.end(f"search:{queue_id}")
+                    res = {"items": res.get("items", [])}
+                yield f"{json.dumps(res)}\n"
+                if res.get("done"):
+                    break
+        finally:
+            __class__.close(queue_id)
+
+    def __query(self, query) -> tuple[str, Queue]:
+        queue_id, queue = __class__.open()
         assert self.api
-        self.api.put_nowait((Command.SEARCH, query))
-        while True:
-            if queue.empty():
-                time.sleep(0.1)
-            else:
-                res = queue.get_nowait()
-                return {"items": res.get("items", [])}
+        LatencyTrace.begin(f"search:{queue_id}", "search")
+        self.api.put_nowait((Command.SEARCH, (query, queue_id)))
+        return queue_id, queue
+
+    def __results(self, queue_id: str, queue: Queue) -> Iterator[dict]:
+        deadline = monotonic() + self.SEARCH_TIMEOUT
+        while (timeout := deadline - monotonic()) > 0:
+            try:
+                res = queue.get(timeout=timeout)
+            except Empty:
+                break
+            if res.get("queue_id") == queue_id:
+                yield res
 
     def state(self):
         return self.state_callback()
@@ -124,6 +168,14 @@ async def search(query: str, auth=Depends(check_auth)):
     return await run_in_threadpool(Server().search, query=query)
 
 
+@Server.app.get("/search-stream/{query:path}")
+async def search_stream(query: str, auth=Depends(check_auth)):
+    return StreamingResponse(
+        Server().search_stream(query=query),
+        media_type="application/x-ndjson"
+    )
+
+
 @Server.app.get("/command/{query:path}")
 async def command(query: str, auth=Depends(check_auth)):
     return await run_in_threadpool(Server().command, query=query)
@@ -62,15 +62,36 @@ def cli_search(query: str):
 @click.option("-d", "--drop_table", default=None)
 def cli_dbinit(drop_table: str):
     try:
-        from yanko.db.models import Album, Artist, ArtistInfo, Beats
+        from yanko.db.models import (
+            Album,
+            AlbumList,
+            Artist,
+            ArtistInfo,
+            Beats,
+            CoverArt,
+            Scrobble,
+            SearchIndex,
+            Song,
+        )
 
+        tables = [
+            Beats,
+            Artist,
+            Album,
+            ArtistInfo,
+            Song,
+            AlbumList,
+            Scrobble,
+            SearchIndex,
+            CoverArt,
+        ]
         with YankoDb.db as db:
             # drop_tables = [ArtistInfo]
             # # if drop_table:
             # #     drop_tables.append(drop_table)
             if drop_table:
-                db.drop_tables([Beats, Artist, Album, ArtistInfo])
-            db.create_tables([Beats, Artist, Album, ArtistInfo])
+                db.drop_tables(tables)
+            db.create_tables(tables)
     except Exception as e:
         print(e)
 
@@ -97,6 +118,49 @@ def cli_beats(path: str):
         print(e)
 
 
+@cli.command("beats-bench", short_help="Benchmark beats decoding")
+@click.argument("path")
+def cli_beats_bench(path: str):
+    import multiprocessing
+    from humanfriendly import format_size
+    from humanfriendly.tables import format_smart_table
+    from yanko.player.bpm import benchmark_decode
+
+    try:
+        assert Path(path).exists()
+        context = multiprocessing.get_context("spawn")
+        rows = []
+        for method in ["wav", "pcm"]:
+            with context.Pool(1) as pool:
+                res = pool.apply(benchmark_decode, (path, method))
+            rows.append([
+                res["method"],
+                f"{res['seconds']:.3f}s",
+                format_size(res["peak_rss"], binary=True),
+                str(res["samples"]),
+            ])
+        click.echo(format_smart_table(rows, ["Method", "Wall", "Peak RSS", "Samples"]))
+    except AssertionError:
+        click.echo(click.style(f"{path} not found", fg="red"))
+
+
+@cli.command("bpm-jitter", short_help="Measure beat scheduling jitter")
+@click.option("-b", "--bpm", default=120.0)
+@click.option("-s", "--seconds", default=10.0)
+def cli_bpm_jitter(bpm: float, seconds: float):
+    from humanfriendly.tables import format_smart_table
+    from yanko.player.scheduler import measure_jitter
+
+    res = measure_jitter(bpm=bpm, seconds=seconds)
+    click.echo(format_smart_table([[
+        str(res.beats),
+        str(res.missed),
+        f"{res.mean * 1000:.2f}ms",
+        f"{res.p95 * 1000:.2f}ms",
+        f"{res.max * 1000:.2f}ms",
+    ]], ["Beats", "Missed", "Mean", "P95", "Max"]))
+
+
 @cli.command("cache", short_help="Cache")
 @click.option("-d", "--delete", default=None)
 def cli_cache(delete: str):
@@ -104,6 +168,7 @@ def cli_cache(delete: str):
         cover_art=CacheType(name="cover_art", count=0, size=0),
         cover_icon=CacheType(name="cover_icon", count=0, size=0),
         beats_json=CacheType(name="beats_json", count=0, size=0),
+        audio=CacheType(name="audio", count=0, size=0),
     )
     for fp in app_config.cache_dir.glob("*"):
         parts = fp.name.split(".")
@@ -115,6 +180,8 @@ def cli_cache(delete: str):
                 cache_struct.cover_art.add(fp)
         if fp.name.endswith("json"):
             cache_struct.beats_json.add(fp)
+    for fp in (app_config.cache_dir / "audio").glob("*.audio"):
+        cache_struct.audio.add(fp)
 
     if delete:
         getattr(cache_struct, delete).clear()
@@ -6,38 +6,108 @@ from progressor import Progress
 from yanko.db.base import YankoDb
 from yanko.db.models import ModelBase
 from pydantic import BaseModel,Field, PrivateAttr
-from functools import lru_cache, wraps
+from collections import OrderedDict
+from copy import deepcopy
+from threading import Lock
 from time import monotonic_ns
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlparse
 
 
 def format_size(*args, **kwds):
     print(args, kwds)
 
 
-def timed_lru_cache(
-    _func=None, *, seconds: int = 10, maxsize: int = 128, typed: bool = False
-):
-    def wrapper_cache(f):
-        f = lru_cache(maxsize=maxsize, typed=typed)(f)
-        f.delta = seconds * 10 ** 9  # type: ignore
-        f.expiration = monotonic_ns() + f.delta  # type: ignore
+class ResponseCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    size: int = 0
 
-        @wraps(f)
-        def wrapped_f(*args, **kwargs):
-            if monotonic_ns() >= f.expiration:  # type: ignore
-                f.cache_clear()
-                f.expiration = monotonic_ns() + f.delta  # type: ignore
-            return f(*args, **kwargs)
+    @property
+    def ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0
+
+
+class ResponseCache(object):
+
+    AUTH_PARAMS = ["u", "t", "s", "v", "c", "f", "p"]
+    DEFAULT_TTL = 20
 
-        wrapped_f.cache_info = f.cache_info
-        wrapped_f.cache_clear = f.cache_clear
-        return wrapped_f
+    def __init__(
+        self,
+        maxsize: int = 256,
+        ttl: Optional[dict[str, float]] = None,
+        default_ttl: float = DEFAULT_TTL
+    ) -> None:
+        self.__maxsize = maxsize
+        self.__ttl = ttl if ttl else {}
+        self.__default_ttl = default_ttl
+        self.__entries: OrderedDict[tuple, tuple[int, Any]] = OrderedDict()
+        self.__stats = ResponseCacheStats()
+        self.__lock = Lock()
+
+    @classmethod
+    def key(cls, url: str) -> tuple:
+        pu = urlparse(url)
+        endpoint = pu.path.split("/")[-1]
+        params = [
+            (k, tuple(v))
+            for k, v in sorted(parse_qs(pu.query).items())
+            if k not in cls.AUTH_PARAMS
+        ]
+        return (endpoint, *params)
+
+    def ttl(self, endpoint: str) -> float:
+        return self.__ttl.get(endpoint, self.__default_ttl)
+
+    def get(self, url: str) -> Optional[Any]:
+        key = self.key(url)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry and entry[0] > monotonic_ns():
+                self.__entries.move_to_end(key)
+                self.__stats.hits += 1
+                return deepcopy(entry[1])
+            if entry:
+                del self.__entries[key]
+            self.__stats.misses += 1
+            return None
+
+    def set(self, url: str, value: Any):
+        key = self.key(url)
+        ttl = self.ttl(key[0])
+        if ttl <= 0 or value is None:
+            return
+        with self.__lock:
+            self.__entries[key] = (
+                monotonic_ns() + int(ttl * 10 ** 9),
+                deepcopy(value)
+            )
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__maxsize:
+                self.__entries.popitem(last=False)
+                self.__stats.evictions += 1
+
+    def invalidate(self, *endpoints: str):
+        with self.__lock:
+            if not endpoints:
+                self.__entries.clear()
+                return
+            for key in list(self.__entries.keys()):
+                if key[0] in endpoints:
+                    del self.__entries[key]
 
-    # To allow decorator to be used without arguments
-    if _func is None:
-        return wrapper_cache
-    else:
-        return wrapper_cache(_func)
+    @property
+    def stats(self) -> ResponseCacheStats:
+        with self.__lock:
+            return ResponseCacheStats(
+                **{
+                    **self.__stats.dict(),
+                    "size": len(self.__entries)
+                }
+            )
 
 
 class CacheType(BaseModel):
@@ -66,6 +136,7 @@ class Cache(BaseModel):
     cover_art: CacheType
     cover_icon: CacheType
     beats_json: CacheType
+    audio: CacheType
 
     def to_table(self):
         data = [map(str, v.values()) for v in self.dict().values()]
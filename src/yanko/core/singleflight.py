@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+from threading import Lock
+from typing import Hashable, Iterator
+
+
+class SingleFlight(object):
+    """Per-key lock, callers holding the same key run one after the other.
+
+    The first caller does the work, the ones waiting behind it find its
+    result in the cache once they get in. Locks are dropped as soon as no
+    one holds or waits on them."""
+
+    def __init__(self) -> None:
+        self.__lock = Lock()
+        self.__keys: dict[Hashable, list] = {}
+
+    @contextmanager
+    def hold(self, key: Hashable) -> Iterator[None]:
+        with self.__lock:
+            entry = self.__keys.setdefault(key, [Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self.__lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self.__keys[key]
@@ -0,0 +1,72 @@
+import logging
+from threading import Lock
+from time import perf_counter
+from typing import Any, Optional
+from pydantic import BaseModel
+
+
+class TraceStats(BaseModel):
+    count: int = 0
+    last: float = 0
+    total: float = 0
+    worst: float = 0
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0
+
+
+class LatencyTraceMeta(type):
+
+    __instance: Optional["LatencyTrace"] = None
+
+    def __call__(cls, *args: Any, **kwds: Any) -> Any:
+        if not cls.__instance:
+            cls.__instance = type.__call__(cls, *args, **kwds)
+        return cls.__instance
+
+    def begin(cls, name: str, label: Optional[str] = None):
+        cls().mark(name, label)
+
+    def end(cls, name: str, at: Optional[float] = None) -> Optional[float]:
+        return cls().complete(name, at)
+
+    @property
+    def stats(cls) -> dict[str, TraceStats]:
+        return cls().get_stats()
+
+
+class LatencyTrace(object, metaclass=LatencyTraceMeta):
+    """Command to effect timings.
+
+    begin() stamps a named trace, end() closes it and records the elapsed
+    time under the label given at begin(), so "playback" can be reported
+    per command that started it. A begin() on an open trace restarts it,
+    an end() without a begin() is ignored."""
+
+    def __init__(self) -> None:
+        self.__lock = Lock()
+        self.__pending: dict[str, tuple[str, float]] = {}
+        self.__stats: dict[str, TraceStats] = {}
+
+    def mark(self, name: str, label: Optional[str] = None):
+        with self.__lock:
+            self.__pending[name] = (label if label else name, perf_counter())
+
+    def complete(self, name: str, at: Optional[float] = None) -> Optional[float]:
+        with self.__lock:
+            if name not in self.__pending:
+                return None
+            label, started = self.__pending.pop(name)
+            elapsed = (at if at else perf_counter()) - started
+            stats = self.__stats.setdefault(label, TraceStats())
+            stats.count += 1
+            stats.last = elapsed
+            stats.total += elapsed
+            stats.worst = max(stats.worst, elapsed)
+        logging.debug(f"latency {name}:{label} -> {elapsed}s")
+        return elapsed
+
+    def get_stats(self) -> dict[str, TraceStats]:
+        with self.__lock:
+            return {k: v.copy() for k, v in self.__stats.items()}
@@ -1,9 +1,8 @@
 import logging
-from playhouse.sqlite_ext import JSONField
+from playhouse.sqlite_ext import FTS5Model, JSONField, SearchField
 from peewee import (
     BooleanField,
     CharField,
-    ForeignKeyField,
     FloatField,
     IntegerField,
     TimestampField,
@@ -41,28 +40,83 @@ class ModelBase(Model):
 
 
 class Artist(ModelBase):
-    id = CharField(index=True)
+    artist_id = CharField(index=True, unique=True)
     name = CharField()
     albumCount = IntegerField(default=0)
     artistImageUrl = CharField(null=True)
+    data = JSONField()
+    updated = TimestampField(utc=True)
+
+    @classmethod
+    def from_response(cls, data: dict) -> dict:
+        return dict(
+            artist_id=data.get("id"),
+            name=data.get("name", ""),
+            albumCount=data.get("albumCount", 0),
+            artistImageUrl=data.get("artistImageUrl"),
+            data=data,
+        )
 
 
 class Album(ModelBase):
-    artistInfo = ForeignKeyField(Artist, related_name='artist_info')
-    id = CharField()
-    parent = CharField()
-    isDir = BooleanField(default=False)
+    album_id = CharField(index=True, unique=True)
+    artistId = CharField(index=True, null=True)
     title = CharField()
-    album = CharField()
-    artist = CharField()
-    duration = IntegerField()
-    created = TimestampField()
-    artistId = CharField()
+    artist = CharField(null=True)
     year = IntegerField(default=0)
-    genre = CharField(null=True)
     coverArt = CharField(null=True)
-    coverArtIcon = CharField(null=True)
     songCount = IntegerField(default=0)
+    data = JSONField()
+    updated = TimestampField(utc=True)
+
+    @classmethod
+    def from_response(cls, data: dict) -> dict:
+        return dict(
+            album_id=data.get("id"),
+            artistId=data.get("artistId"),
+            title=next(
+                filter(None, [data.get(k) for k in ("name", "title", "album")]),
+                ""
+            ),
+            artist=data.get("artist"),
+            year=data.get("year") or 0,
+            coverArt=data.get("coverArt"),
+            songCount=data.get("songCount", 0),
+            data=data,
+        )
+
+
+class Song(ModelBase):
+    song_id = CharField(index=True, unique=True)
+    albumId = CharField(index=True, null=True)
+    artistId = CharField(index=True, null=True)
+    title = CharField()
+    artist = CharField(null=True)
+    album = CharField(null=True)
+    data = JSONField()
+    updated = TimestampField(utc=True)
+
+    @classmethod
+    def from_response(cls, data: dict) -> dict:
+        return dict(
+            song_id=data.get("id"),
+            albumId=data.get("albumId"),
+            artistId=data.get("artistId"),
+            title=data.get("title", ""),
+            artist=data.get("artist"),
+            album=data.get("album"),
+            data=data,
+        )
+
+
+class AlbumList(ModelBase):
+    list_type = CharField(index=True, unique=True)
+    data = JSONField()
+    updated = TimestampField(utc=True)
+
+    @classmethod
+    def from_response(cls, data: dict) -> dict:
+        return dict(data=data)
 
 
 class ArtistInfo(ModelBase):
@@ -94,3 +148,36 @@ class Beats(ModelBase):
         del data["path"]
         del data["id"]
         return cls.update(**data).where(cls.path == path).execute()
+
+
+class Scrobble(ModelBase):
+    song_id = CharField(index=True)
+    played = IntegerField(index=True)
+    submission = BooleanField(default=True)
+    attempts = IntegerField(default=0)
+
+
+class SearchIndex(FTS5Model):
+    kind = SearchField(unindexed=True)
+    item_id = SearchField(unindexed=True)
+    name = SearchField()
+    artist = SearchField()
+    album = SearchField()
+    data = SearchField(unindexed=True)
+
+    class Meta:
+        database = YankoDb.db
+        options = {
+            "tokenize": "unicode61 remove_diacritics 2",
+            "prefix": "2 3",
+        }
+
+
+class CoverArt(ModelBase):
+    filename = CharField(index=True, unique=True)
+    size = IntegerField(default=0)
+    mtime = FloatField(default=0)
+    placeholder = BooleanField(default=False)
+    icon_width = IntegerField(null=True)
+    icon_height = IntegerField(null=True)
+    updated = TimestampField(utc=True)
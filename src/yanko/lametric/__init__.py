@@ -20,6 +20,7 @@ class NowPlayingFrame(BaseModel):
 
 class StatusFrame(BaseModel):
     status: str
+    position: Optional[float] = None
 
 
 class LaMetricMeta(type):
@@ -34,8 +35,8 @@ class LaMetricMeta(type):
     def nowplaying(cls, text, icon: Optional[str] = None):
         cls().send_nowplaying(text, icon)
 
-    def status(cls, status: Status = Status.STOPPED):
-        cls().send_status(status)
+    def status(cls, status: Status = Status.STOPPED, position: Optional[float] = None):
+        cls().send_status(status, position)
 
 
 class LaMetric(object, metaclass=LaMetricMeta):
@@ -75,7 +76,12 @@ class LaMetric(object, metaclass=LaMetricMeta):
 
         return self.__make_request(Method.POST, "api/nowplaying", json=model.dict())
 
-    def send_status(self, status: Status = Status.STOPPED):
-        return self.__make_request(
-            Method.GET, "api/playstatus", params=dict(status=status.value)
-        )
+    def send_status(
+        self,
+        status: Status = Status.STOPPED,
+        position: Optional[float] = None
+    ):
+        params: dict = dict(status=status.value)
+        if position is not None:
+            params["position"] = round(position, 2)
+        return self.__make_request(Method.GET, "api/playstatus", params=params)
@@ -2,9 +2,9 @@ from pathlib import Path
 from queue import Queue
 from threading import Event
 from typing import Optional
-from urllib.parse import parse_qs, urlencode, urlparse
 from yanko.core.config import app_config
 from yanko.sonic import Status, StreamFormat
+from .source import StreamSource
 
 
 class BasePlayer(object):
@@ -21,7 +21,7 @@ class BasePlayer(object):
         format: StreamFormat,
         volume: float = 1,
         muted: bool = False,
-
+        next_track: Optional[dict] = None,
     ):
         self.volume = volume
         self.muted = muted
@@ -33,6 +33,8 @@ class BasePlayer(object):
         self._url = stream_url
         self._data = track_data
         self._format = format
+        self._source = StreamSource(stream_url, format)
+        self._next_track = next_track
 
     @property
     def lock_file(self) -> Path:
@@ -40,13 +42,18 @@ class BasePlayer(object):
 
     @property
     def stream_url(self):
-        song_id = self._data.get("id")
-        url = urlparse(self._url)
-        query = parse_qs(url.query)
-        query = dict(id=song_id, format=self._format.value, **query)
-        if self._format == StreamFormat.NONE:
-            del query["format"]
-        return f"{url.scheme}://{url.netloc}{url.path}?{urlencode(query, doseq=True)}"
+        return self.get_stream_url(self._data.get("id"))
+
+    @property
+    def source(self) -> StreamSource:
+        return self._source
+
+    @property
+    def isTranscoded(self) -> bool:
+        return self._source.isTranscoded
+
+    def get_stream_url(self, song_id, offset: float = 0):
+        return self._source.url(song_id, offset)
 
     @property
     def hasFinished(self):
@@ -61,6 +68,9 @@ class BasePlayer(object):
     def _restart(self):
         raise NotImplementedError
 
+    def _seek(self, position: float):
+        raise NotImplementedError
+
     def _next(self):
         raise NotImplementedError
 
@@ -1,4 +1,7 @@
 import logging
+import resource
+import sys
+import ffmpeg
 from yanko.core.shell import Shell
 from pathlib import Path
 from corefile import TempPath
@@ -17,10 +20,12 @@ from librosa import (
 )
 from librosa.util import peak_pick, softmask
 import numpy as np
-from typing import Optional, Any
+from typing import Callable, Optional, Any
 from pydantic import BaseModel
 from yanko.core.bytes import nearest_bytes
+from yanko.core.config import app_config
 from threading import Lock
+from time import perf_counter
 from yanko.core import perftime
 
 music_lock = Lock()
@@ -30,6 +35,7 @@ class BeatsStruct(BaseModel):
     path: Path | str
     beats: Optional[list[float]] = None
     tempo: Optional[float] = None
+    partial: bool = False
 
 
 class Decoder(Shell):
@@ -54,6 +60,79 @@ class Decoder(Shell):
         ]
 
 
+class PcmDecoder(object):
+    """Decodes straight into a mono float32 array at the analysis rate.
+
+    ffmpeg writes pcm_f32le to a pipe that is read in chunks into an array
+    sized from the probed duration, so there is no temp file and no second
+    decode, and the peak is the samples themselves. Tracks longer than
+    max_seconds are cut to keep very long mixes bounded. on_chunk gets the
+    samples decoded so far after every chunk."""
+
+    SAMPLE_RATE = 22050
+    CHUNK_SIZE = 256 * 1024
+    LOUDNORM = "loudnorm=I=-5:LRA=15:TP=0"
+
+    def __init__(self, input_path: Path, max_seconds: Optional[float] = None):
+        self.__path = input_path
+        if max_seconds is None:
+            max_seconds = app_config.get("beats", {}).get("max_seconds", 1800)
+        self.__max_seconds = max_seconds
+
+    def __expected_samples(self) -> int:
+        try:
+            info = ffmpeg.probe(self.__path.as_posix())
+            duration = float(info.get("format", {}).get("duration", 0))
+        except (ffmpeg.Error, ValueError):
+            duration = 0
+        if self.__max_seconds:
+            duration = min(duration, self.__max_seconds)
+        return int((duration + 1) * self.SAMPLE_RATE)
+
+    def decode(
+        self,
+        on_chunk: Optional[Callable[[np.ndarray], None]] = None
+    ) -> tuple[np.ndarray, int]:
+        input_args = dict(t=self.__max_seconds) if self.__max_seconds else {}
+        process = (
+            ffmpeg.input(self.__path.as_posix(), **input_args)
+            .output(
+                "pipe:",
+                format="f32le",
+                acodec="pcm_f32le",
+                ac=1,
+                ar=self.SAMPLE_RATE,
+                af=self.LOUDNORM,
+                loglevel="fatal",
+            )
+            .run_async(pipe_stdout=True)
+        )
+        samples = np.empty(
+            max(self.__expected_samples(), self.CHUNK_SIZE), dtype=np.float32
+        )
+        filled = 0
+        try:
+            while True:
+                if filled + self.CHUNK_SIZE > samples.nbytes:
+                    grown = np.empty(
+                        int(len(samples) * 1.5) + self.CHUNK_SIZE, dtype=np.float32
+                    )
+                    grown.view(np.uint8)[:filled] = samples.view(np.uint8)[:filled]
+                    samples = grown
+                view = memoryview(samples.view(np.uint8)[filled:filled + self.CHUNK_SIZE])
+                read = process.stdout.readinto(view)
+                view.release()
+                if not read:
+                    break
+                filled += read
+                if on_chunk:
+                    on_chunk(samples[:filled // samples.itemsize])
+        finally:
+            process.stdout.close()
+            process.wait()
+        return samples[:filled // samples.itemsize], self.SAMPLE_RATE
+
+
 class BeatsMeta(type):
 
     __store_root: Optional[Path]
@@ -82,27 +161,30 @@ class Beats(object, metaclass=BeatsMeta):
         with_vocals=False,
         force=False
     ):
+        self.__original_path = path
         path = path.split("Music/")[-1]
         self.__requested_path = path
         self.__path = Beats.store_root / path.lstrip("/")
-        self.__tmppath = TempPath(f"{uuid4().hex}.wav")
+        self.__samples: Optional[tuple[np.ndarray, int]] = None
         self.__hop_length = hop_length
         self.__margin = nearest_bytes(margin)
         self.__with_vocals = with_vocals
         assert self.__path.exists()
 
-    def __decode(self):
-        if not self.__tmppath.exists():
-            worker = Decoder(input_path=self.__path, output_path=self.__tmppath)
-            return worker.execute()
+    def __decode(
+        self,
+        on_chunk: Optional[Callable[[np.ndarray], None]] = None
+    ) -> tuple[np.ndarray, int]:
+        if self.__samples is None:
+            self.__samples = PcmDecoder(self.__path).decode(on_chunk)
+        return self.__samples
 
     @property
     def requested_path(self) -> str:
         return self.__requested_path
 
     def fast_bpm(self) -> BeatsStruct:
-        self.__decode()
-        y, sr = load(self.__tmppath.as_posix())
+        y, sr = self.__decode()
         onset_env = onset.onset_strength(y=y, sr=sr, aggregate=np.median)
         tempo, _ = beat.beat_track(onset_envelope=onset_env, sr=sr)
         return BeatsStruct(
@@ -111,62 +193,158 @@ class Beats(object, metaclass=BeatsMeta):
             path=self.__requested_path,
         )
 
-    def extract(self) -> BeatsStruct:
+    def extract(
+        self,
+        on_partial: Optional[Callable[[BeatsStruct], None]] = None
+    ) -> BeatsStruct:
         with music_lock:
+            stream = self.__stream(PcmDecoder.SAMPLE_RATE, on_partial) if on_partial else None
             with perftime(f"decoding {self.__path}"):
-                self.__decode()
-                assert self.__tmppath.exists()
+                y, sr = self.__decode(stream)
+                assert len(y)
+            if stream:
+                with perftime(f"streaming beats {self.__path}"):
+                    stream(y, complete=True)
             with perftime(f"extracting beats {self.__path}"):
-                y, sr = load(self.__tmppath.as_posix())
-                D = stft(y)
-                y_percussive = None
-                if self.__with_vocals:
-                    logging.debug(f"Percussive margin: {self.__margin}")
-                    _, D_percussive = decompose.hpss(D, margin=self.__margin)
-                    y_percussive = istft(D_percussive, length=len(y))
-                else:
-                    logging.debug(f"No vocals mode: {self.__path}")
-                    S_full, phase = magphase(stft(y))
-                    S_filter = decompose.nn_filter(
-                        S_full,
-                        aggregate=np.median,
-                        metric="cosine",
-                        width=int(time_to_frames(2, sr=sr)),
-                    )
-                    S_filter = np.minimum(S_full, S_filter)
-                    margin_i, _ = 2, 10
-                    power = 2
-
-                    mask_i = softmask(
-                        S_filter,
-                        margin_i * (S_full - S_filter),
-                        power=power
-                    )
-                    S_background = mask_i * S_full
-                    D_background = S_background * phase
-                    y_percussive = istft(D_background)
-
-                spectral_novelty = onset.onset_strength(
-                    y=y_percussive, sr=sr, hop_length=self.__hop_length
-                )
-
-                onset_frames = peak_pick(
-                    spectral_novelty,
-                    pre_max=3,
-                    post_max=3,
-                    pre_avg=3,
-                    post_avg=5,
-                    delta=0.5,
-                    wait=10,
-                )
-
-                beat_times = frames_to_time(
-                    onset_frames, hop_length=self.__hop_length
-                )
+                y_percussive = self.__percussive(y, sr)
+                beat_times = self.__onsets(y_percussive, sr)
                 tempo = feature.tempo(y=y_percussive, sr=sr)
-
                 return BeatsStruct(
                     beats=list(map(float, list(beat_times))),
                     tempo=float(tempo[0]),  # type: ignore
                     path=self.__requested_path,
                 )
+
+    def __stream(
+        self,
+        sr: int,
+        on_partial: Callable[[BeatsStruct], None]
+    ) -> Callable[..., None]:
+        """Returns the decoder's on_chunk, it analyses each window of the
+        preview as soon as the samples cover it and its context, and the
+        rest of the preview once it is called with complete=True."""
+        config = app_config.get("beats", {})
+        window = config.get("stream_window", 30)
+        context = config.get("stream_context", 5)
+        preview = config.get("stream_preview", 90)
+        beats: list[float] = []
+        start = 0
+
+        def on_chunk(y: np.ndarray, complete: bool = False):
+            nonlocal start
+            decoded = len(y) / sr
+            while start < min(preview, decoded):
+                end = start + window
+                if not complete and decoded < end + context:
+                    return
+                offset = max(0, start - context)
+                segment = y[int(offset * sr):int((end + context) * sr)]
+                y_percussive = self.__percussive(segment, sr)
+                beats.extend(
+                    float(t + offset)
+                    for t in self.__onsets(y_percussive, sr)
+                    if start <= t + offset < end
+                )
+                tempo = feature.tempo(y=y_percussive, sr=sr)
+                on_partial(
+                    BeatsStruct(
+                        beats=beats[:],
+                        tempo=float(tempo[0]),  # type: ignore
+                        path=self.__original_path,
+                        partial=True,
+                    )
+                )
+                start = end
+
+        return on_chunk
+
+    def __percussive(self, y: np.ndarray, sr: int) -> np.ndarray:
+        if self.__with_vocals:
+            logging.debug(f"Percussive margin: {self.__margin}")
+            _, D_percussive = decompose.hpss(stft(y), margin=self.__margin)
+            return istft(D_percussive, length=len(y))
+        logging.debug(f"No vocals mode: {self.__path}")
+        S_full, phase = magphase(stft(y))
+        S_filter = decompose.nn_filter(
+            S_full,
+            aggregate=np.median,
+            metric="cosine",
+            width=int(time_to_frames(2, sr=sr)),
+        )
+        S_filter = np.minimum(S_full, S_filter)
+        margin_i, _ = 2, 10
+        power = 2
+
+        mask_i = softmask(
+            S_filter,
+            margin_i * (S_full - S_filter),
+            power=power
+        )
+        S_background = mask_i * S_full
+        D_background = S_background * phase
+        return istft(D_background)
+
+    def __onsets(self, y_percussive: np.ndarray, sr: int) -> np.ndarray:
+        spectral_novelty = onset.onset_strength(
+            y=y_percussive, sr=sr, hop_length=self.__hop_length
+        )
+
+        onset_frames = peak_pick(
+            spectral_novelty,
+            pre_max=3,
+            post_max=3,
+            pre_avg=3,
+            post_avg=5,
+            delta=0.5,
+            wait=10,
+        )
+
+        return frames_to_time(
+            onset_frames, sr=sr, hop_length=self.__hop_length
+        )
+
+
+def extract_job(
+    path: str,
+    store_root: str,
+    extract: bool,
+    updates: Any = None
+) -> tuple[dict, float]:
+    """Runs in a worker process, updates is a managed queue for the
+    partial beats that arrive while the track is still decoding."""
+    started = perf_counter()
+    Beats.register(store_root=store_root)
+    extractor = Beats(path)
+    if not extract:
+        return extractor.fast_bpm().dict(), perf_counter() - started
+    result = extractor.extract(
+        on_partial=(lambda b: updates.put(b.dict())) if updates else None
+    )
+    return result.dict(), perf_counter() - started
+
+
+def benchmark_decode(path: str, method: str) -> dict:
+    """Decodes path with the "pcm" pipe or the old "wav" temp file path and
+    reports wall time and the peak RSS growth of the calling process, run
+    it in a fresh process per method."""
+    scale = 1 if sys.platform == "darwin" else 1024
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    started = perf_counter()
+    if method == "wav":
+        tmppath = TempPath(f"{uuid4().hex}.wav")
+        try:
+            Decoder(input_path=Path(path), output_path=tmppath).execute()
+            y, sr = load(tmppath.as_posix())
+        finally:
+            tmppath.unlink(missing_ok=True)
+    else:
+        y, sr = PcmDecoder(Path(path)).decode()
+    elapsed = perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    return dict(
+        method=method,
+        seconds=elapsed,
+        peak_rss=peak - baseline,
+        samples=len(y),
+        sample_rate=sr,
+    )
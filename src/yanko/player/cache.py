@@ -0,0 +1,153 @@
+import logging
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Any, Optional
+from pydantic import BaseModel
+from yanko.core.config import app_config
+
+
+class AudioCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    stored: int = 0
+    rejected: int = 0
+    evicted: int = 0
+    bytes_saved: int = 0
+
+    @property
+    def ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0
+
+
+class CacheWriter(object):
+
+    def __init__(self, cache: "AudioCache", key: str, expected: Optional[int] = None):
+        self.__cache = cache
+        self.key = key
+        self.expected = expected
+        self.size = 0
+        self.__path = cache.file_path(key).with_suffix(".part")
+        self.__fp = self.__path.open("wb")
+
+    def write(self, data: bytes):
+        self.__fp.write(data)
+        self.size += len(data)
+
+    def commit(self):
+        self.__fp.close()
+        if self.expected and self.size != self.expected:
+            logging.warning(
+                f"audio cache {self.key} incomplete {self.size}/{self.expected}"
+            )
+            return self.abort()
+        self.__cache.store(self.key, self.__path)
+
+    def abort(self):
+        if not self.__fp.closed:
+            self.__fp.close()
+        self.__path.unlink(missing_ok=True)
+        self.__cache.reject(self.key)
+
+
+class AudioCacheMeta(type):
+
+    __instance: Optional["AudioCache"] = None
+
+    def __call__(cls, *args: Any, **kwds: Any) -> Any:
+        if not cls.__instance:
+            cls.__instance = type.__call__(cls, *args, **kwds)
+        return cls.__instance
+
+    @property
+    def enabled(cls) -> bool:
+        return cls().is_enabled()
+
+    def path(cls, key: str) -> Optional[Path]:
+        return cls().get(key)
+
+    def stored(cls, key: str) -> bool:
+        return cls().is_stored(key)
+
+    def writer(cls, key: str, expected: Optional[int] = None) -> Optional[CacheWriter]:
+        return cls().create_writer(key, expected)
+
+    @property
+    def stats(cls) -> AudioCacheStats:
+        return cls().get_stats()
+
+
+class AudioCache(object, metaclass=AudioCacheMeta):
+
+    MAX_SIZE = 2 * 1024 ** 3
+
+    def __init__(self) -> None:
+        config = app_config.get("audio_cache", {})
+        self.__enabled = config.get("enabled", True)
+        self.__max_size = config.get("max_size", self.MAX_SIZE)
+        self.__root = app_config.cache_dir / "audio"
+        self.__root.mkdir(parents=True, exist_ok=True)
+        self.__lock = Lock()
+        self.__pending: set[str] = set()
+        self.__stats = AudioCacheStats()
+        for part in self.__root.glob("*.part"):
+            part.unlink(missing_ok=True)
+
+    def is_enabled(self) -> bool:
+        return self.__enabled
+
+    def file_path(self, key: str) -> Path:
+        return self.__root / f"{key}.audio"
+
+    def is_stored(self, key: str) -> bool:
+        with self.__lock:
+            return self.file_path(key).exists()
+
+    def get(self, key: str) -> Optional[Path]:
+        pth = self.file_path(key)
+        with self.__lock:
+            if not self.__enabled or not pth.exists():
+                self.__stats.misses += 1
+                return None
+            os.utime(pth)
+            self.__stats.hits += 1
+            self.__stats.bytes_saved += pth.stat().st_size
+            return pth
+
+    def create_writer(self, key: str, expected: Optional[int] = None) -> Optional[CacheWriter]:
+        with self.__lock:
+            if not self.__enabled or key in self.__pending:
+                return None
+            if self.file_path(key).exists():
+                return None
+            self.__pending.add(key)
+        return CacheWriter(self, key, expected)
+
+    def store(self, key: str, part: Path):
+        with self.__lock:
+            part.rename(self.file_path(key))
+            self.__pending.discard(key)
+            self.__stats.stored += 1
+        self.evict()
+
+    def reject(self, key: str):
+        with self.__lock:
+            self.__pending.discard(key)
+            self.__stats.rejected += 1
+
+    def evict(self):
+        with self.__lock:
+            files = sorted(
+                self.__root.glob("*.audio"),
+                key=lambda f: f.stat().st_mtime
+            )
+            total = sum(f.stat().st_size for f in files)
+            while files and total > self.__max_size:
+                oldest = files.pop(0)
+                total -= oldest.stat().st_size
+                oldest.unlink(missing_ok=True)
+                self.__stats.evicted += 1
+
+    def get_stats(self) -> AudioCacheStats:
+        return self.__stats.copy()
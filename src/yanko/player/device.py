@@ -1,6 +1,7 @@
 import logging
 from typing import Optional, Any
 from yanko.core.bytes import nearest_bytes
+from yanko.core.config import app_config
 from pydantic import BaseModel, Field
 import sounddevice as sd
 from rich import print
@@ -57,6 +58,16 @@ class DeviceParams(BaseModel):
     def buffsize(self) -> int:
         return 20
 
+    @property
+    def ringsize(self) -> int:
+        seconds = app_config.get("player", {}).get("buffer", 10)
+        return max(self.blocksize * 2, int(self.samplerate * seconds))
+
+    @property
+    def low_watermark(self) -> int:
+        seconds = app_config.get("player", {}).get("low_watermark", 4)
+        return min(self.ringsize - self.blocksize, int(self.samplerate * seconds))
+
 
 class DeviceMeta(type):
 
@@ -98,6 +109,14 @@ class DeviceMeta(type):
     def buffsize(cls) -> int:
         return cls().get_property("buffsize")
 
+    @property
+    def ringsize(cls) -> int:
+        return cls().get_property("ringsize")
+
+    @property
+    def low_watermark(cls) -> int:
+        return cls().get_property("low_watermark")
+
     @property
     def index(cls) -> int:
         return cls().get_property("index")
@@ -0,0 +1,140 @@
+import logging
+from threading import Lock
+from time import perf_counter
+from typing import Any, Optional, TYPE_CHECKING
+import numpy as np
+import sounddevice as sd
+from pydantic import BaseModel
+from yanko.player.device import Device
+
+if TYPE_CHECKING:
+    from .output import Output
+
+
+class EngineStats(BaseModel):
+    device_open_time: float = 0
+    underruns: int = 0
+    status_errors: int = 0
+    frames: int = 0
+
+
+class EngineMeta(type):
+
+    __instance: Optional["Engine"] = None
+
+    def __call__(cls, *args: Any, **kwds: Any) -> Any:
+        if not cls.__instance:
+            cls.__instance = type.__call__(cls, *args, **kwds)
+        return cls.__instance
+
+    def register(cls):
+        cls()
+
+    def attach(cls, source: "Output"):
+        cls().set_source(source)
+
+    def detach(cls, source: "Output"):
+        cls().unset_source(source)
+
+    @property
+    def samplesize(cls) -> int:
+        return cls().get_samplesize()
+
+    @property
+    def stats(cls) -> EngineStats:
+        return cls().get_stats()
+
+    @property
+    def position(cls) -> Optional[float]:
+        if not cls.__instance:
+            return None
+        return cls().get_position()
+
+    def close(cls):
+        cls().stop()
+
+
+class Engine(object, metaclass=EngineMeta):
+
+    __source: Optional["Output"] = None
+    __stream: sd.OutputStream
+
+    def __init__(self) -> None:
+        self.__lock = Lock()
+        self.__stats = EngineStats()
+        self.open()
+
+    def open(self):
+        started = perf_counter()
+        self.__stream = sd.OutputStream(
+            samplerate=Device.samplerate,
+            blocksize=Device.blocksize,
+            extra_settings=(
+                sd.CoreAudioSettings(
+                    change_device_parameters=True
+                )
+            ),
+            device=Device.index,
+            channels=Device.output_channels,
+            dtype="float32",
+            dither_off=True,
+            clip_off=True,
+            callback=self.__callback,
+        )
+        self.__stream.start()
+        self.__stats.device_open_time = perf_counter() - started
+        logging.debug(f"output device opened in {self.__stats.device_open_time}s")
+
+    def stop(self):
+        self.__stream.stop()
+        self.__stream.close()
+
+    def get_samplesize(self) -> int:
+        return self.__stream.samplesize  # type: ignore
+
+    def get_stats(self) -> EngineStats:
+        return self.__stats.copy()
+
+    def get_position(self) -> Optional[float]:
+        source = self.__source
+        return source.position if source else None
+
+    def set_source(self, source: "Output"):
+        with self.__lock:
+            self.__source = source
+
+    def unset_source(self, source: "Output"):
+        with self.__lock:
+            if self.__source is source:
+                self.__source = None
+        logging.debug(f"output engine -> {self.__stats}")
+
+    def __callback(self, outdata: np.ndarray, frames: int, time, status: sd.CallbackFlags):
+        if status.output_underflow:
+            self.__stats.status_errors += 1
+        out = outdata.reshape(-1)
+        source = self.__source
+        if not source or source.paused or source.drained.is_set():
+            out.fill(0)
+            return
+        start_frames = source.frames
+        read = source.ring.read_into(out)
+        if read < len(out):
+            out[read:] = 0
+            if source.ring.eof:
+                source.drain()
+            else:
+                self.__stats.underruns += 1
+        written = read // Device.output_channels
+        source.frames += written
+        source.played_frames += written
+        self.__stats.frames += written
+        if written:
+            source.mark(
+                start_frames,
+                perf_counter() + max(0, time.outputBufferDacTime - time.currentTime)
+            )
+            if not source.started.is_set():
+                source.first_sample_at = perf_counter()
+                source.started.set()
+            source.time_event.set()
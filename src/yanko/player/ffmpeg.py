@@ -1,14 +1,19 @@
 import sys
-import time as _time
+from functools import partial
 from queue import Empty
 from typing import Optional
 import ffmpeg
 from yanko.player.base import BasePlayer
-from yanko.sonic import Action, Command, Playstatus, Status
+from yanko.core import perftime
+from yanko.player.device import Device
+from yanko.sonic import Action, Command, PlaybackPosition, Playstatus, Status
 import logging
 from .input import Input
 from .output import Output
 from .exceptions import StreamEnded
+from .cache import AudioCache
+from .prefetch import Prefetch
+from .ringbuffer import RingBuffer
 
 
 def int_or_str(text):
@@ -24,8 +29,11 @@ class FFMPeg(BasePlayer):
     __status: Optional[Status] = None
     __reader: Optional[Input] = None
     __writer: Optional[Output] = None
+    __prefetched: bool = False
     _start = 0
 
+    PREFETCH_POLL = 0.5
+
     @property
     def status(self) -> Status:
         assert self.__status
@@ -38,6 +46,14 @@ class FFMPeg(BasePlayer):
             (Command.PLAYER_RESPONSE, Playstatus(status=val))
         )
 
+    @property
+    def position(self) -> float:
+        return self.__writer.position if self.__writer else 0
+
+    @property
+    def played(self) -> float:
+        return self.__writer.played if self.__writer else 0
+
     def probe(self):
         try:
             info = ffmpeg.probe(self.stream_url)
@@ -52,33 +68,44 @@ class FFMPeg(BasePlayer):
 
     def play(self):
         try:
+            prefetched = Prefetch.take(self._data.get("id"))
             self.__writer = Output(
                 time_event=self._time_event,
                 volume=int(self.volume),
                 muted=self.muted,
                 end_event=self._end_event,
+                ring=prefetched.ring if prefetched else None,
+                on_end=partial(self._queue.put_nowait, (Action.ENDED, self)),
             )
             self._control = self.__writer.control_queue
             logging.debug("Opening stream ...")
-            self.__reader = Input(
-                url=self.stream_url,
-                outputQueue=self.__writer.data_queue,
-                samplesize=self.__writer.samplesize,
-            )
+            if prefetched:
+                self.__reader = prefetched
+            else:
+                self.__reader = self.create_input(self._data, self.__writer.ring)
+                self.__reader.start()
             self.__writer.start()
-            self.__reader.start()
             self.status = Status.PLAYING
             while True:
-                if not self.__writer.is_alive():
+                try:
+                    command, payload = self._queue.get(timeout=self.__wait_time())
+                except Empty:
+                    self.prefetch()
+                    continue
+                self._queue.task_done()
+                if command == Action.ENDED:
+                    if payload is not self:
+                        continue
                     logging.debug("end event set")
                     break
-                if queue_action := self.process_queue():
+                if queue_action := self.process_command(command, payload):
                     self._time_event.clear()
                     self.__reader.stop()
                     self.__writer.stop()
+                    if queue_action in [Status.STOPPED, Status.EXIT]:
+                        Prefetch.cancel()
                     self.status = Status.STOPPED
                     return queue_action
-                _time.sleep(0.1)
         except StreamEnded as e:
             logging.exception(e)
         except Exception as e:
@@ -87,49 +114,100 @@ class FFMPeg(BasePlayer):
         self._time_event.clear()
         return Status.PLAYING
 
-    def process_queue(self):
+    def create_input(self, track: dict, ring: RingBuffer, offset: float = 0) -> Input:
+        song_id = track.get("id")
+        key = self.source.cache_key(song_id)
+        if cached := AudioCache.path(key):
+            logging.debug(f"playing {song_id} from audio cache")
+            return Input(url=cached.as_posix(), ring=ring, offset=offset)
+        url = self.get_stream_url(song_id, offset)
+        if offset:
+            return Input(url=url, ring=ring, offset=0 if self.isTranscoded else offset)
+        tee = None
+        if self.source.isStreamable(track):
+            tee = AudioCache.writer(key, self.source.expected_size(track))
+        return Input(url=url, ring=ring, tee=tee)
+
+    def prefetch(self):
         try:
-            command, payload = self._queue.get_nowait()
-            assert self._control
-            match (command):
-                case Action.RESTART:
-                    self._queue.task_done()
-                    return self._restart()
-                case Action.NEXT:
-                    self._queue.task_done()
-                    return self._next()
-                case Action.PREVIOUS:
-                    self._queue.task_done()
-                    return self._previous()
-                case Action.STOP:
-                    self._queue.task_done()
-                    return self._stop()
-                case Action.EXIT:
-                    self._queue.task_done()
-                    return self.exit()
-                case Action.PAUSE:
-                    self._control.put_nowait((Action.PAUSE, None))
-                    self.status = Status.PAUSED
-                case Action.RESUME:
-                    self._control.put_nowait((Action.RESUME, None))
-                    self.status = Status.RESUMED
-                case Action.VOLUME_DOWN:
-                    self._control.put_nowait((Action.VOLUME_DOWN, payload))
-                case Action.VOLUME_UP:
-                    self._control.put_nowait((Action.VOLUME_UP, payload))
-                case Action.MUTE:
-                    self._control.put_nowait((Action.MUTE, payload))
-                case _:
-                    return None
-        except Empty:
+            assert self._next_track
+            assert self.__writer
+            assert not self.__prefetched
+            duration = self._data.get("duration", 0)
+            remaining = duration - self.__writer.position
+            assert remaining <= Prefetch.seconds
+            track = self._next_track
+            Prefetch.load(
+                song_id=track.get("id"),
+                factory=lambda ring: self.create_input(track, ring),
+            )
+            self.__prefetched = True
+        except AssertionError:
+            pass
+
+    def __wait_time(self) -> Optional[float]:
+        if not self._next_track or self.__prefetched or not self.__writer:
             return None
-        self._queue.task_done()
+        duration = self._data.get("duration", 0)
+        remaining = duration - self.__writer.position - Prefetch.seconds
+        return max(remaining, self.PREFETCH_POLL)
+
+    def process_command(self, command: Action, payload):
+        assert self._control
+        match (command):
+            case Action.RESTART:
+                self._restart()
+            case Action.SEEK:
+                self._seek(float(payload))
+            case Action.NEXT:
+                return self._next()
+            case Action.PREVIOUS:
+                return self._previous()
+            case Action.STOP:
+                return self._stop()
+            case Action.EXIT:
+                return self.exit()
+            case Action.PAUSE:
+                self._control.put_nowait((Action.PAUSE, None))
+                self.status = Status.PAUSED
+            case Action.RESUME:
+                self._control.put_nowait((Action.RESUME, None))
+                self.status = Status.RESUMED
+            case Action.VOLUME_DOWN:
+                self._control.put_nowait((Action.VOLUME_DOWN, payload))
+            case Action.VOLUME_UP:
+                self._control.put_nowait((Action.VOLUME_UP, payload))
+            case Action.MUTE:
+                self._control.put_nowait((Action.MUTE, payload))
+        return None
 
     def _stop(self):
         return Status.STOPPED
 
     def _restart(self):
-        return self.play()
+        return self._seek(0)
+
+    def _seek(self, position: float):
+        try:
+            assert self.__writer
+            assert self.__reader
+            assert not self.__writer.drained.is_set()
+            duration = self._data.get("duration", 0)
+            position = max(0, min(position, duration - 1)) if duration else max(0, position)
+            with perftime(f"seek to {position}"):
+                self.__reader.stop()
+                self.__reader.join(timeout=1)
+                self.__writer.ring.flush()
+                self.__reader = self.create_input(
+                    self._data, self.__writer.ring, position
+                )
+                self.__reader.start()
+                self.__writer.reset_clock(int(position * Device.samplerate))
+            self._manager_queue.put_nowait(
+                (Command.PLAYER_RESPONSE, PlaybackPosition(position=position))
+            )
+        except AssertionError:
+            pass
 
     def _next(self):
         return Status.NEXT
@@ -138,12 +216,13 @@ class FFMPeg(BasePlayer):
         return Status.PREVIOUS
 
     def pause(self):
-        self._queue.put_nowait(Action.PAUSE)
+        self._queue.put_nowait((Action.PAUSE, None))
 
     def resume(self):
-        self._queue.put_nowait(Action.RESUME)
+        self._queue.put_nowait((Action.RESUME, None))
 
     def exit(self):
+        Prefetch.cancel()
         if self.__reader:
             self.__reader.stop()
         if self.__writer:
@@ -1,36 +1,53 @@
 from corethread import StoppableThread
-from queue import Queue
 import ffmpeg
 import logging
-from time import sleep
+import numpy as np
+from requests.exceptions import RequestException
+from threading import Thread
+from typing import Optional
 from yanko.player.device import Device
+from yanko.player.cache import CacheWriter
+from yanko.player.ringbuffer import RingBuffer
+from yanko.sonic.session import Session
 
 
 class Input(StoppableThread):
 
+    CHUNK_SIZE = 64 * 1024
+
     url: str
-    queue: Queue
-    samplesize: int
+    ring: RingBuffer
 
     def __init__(
         self,
         url: str,
-        outputQueue: Queue,
-        samplesize: int,
+        ring: RingBuffer,
+        offset: float = 0,
+        tee: Optional[CacheWriter] = None,
         *args,
         **kwargs,
     ):
         self.url = url
-        self.samplesize = samplesize
-        self.queue = outputQueue
+        self.ring = ring
+        self.offset = offset
+        self.tee = tee
+        self.__process = None
         super().__init__(*args, **kwargs)
 
+    def stop(self):
+        super().stop()
+        if self.__process:
+            self.__process.terminate()
+
     def run(self):
         logging.debug(f"Reader started for {self.url}")
-        read_size = Device.blocksize * Device.output_channels * self.samplesize
+        block = np.zeros(Device.blocksize * Device.output_channels, dtype=np.float32)
+        view = memoryview(block).cast("B")
+        input_args = dict(ss=self.offset) if self.offset else {}
         process = (
             ffmpeg.input(
-                self.url,
+                "pipe:" if self.tee else self.url,
+                **input_args
             )
             .output(
                 "pipe:",
@@ -40,16 +57,57 @@ class Input(StoppableThread):
                 ar=Device.samplerate,
                 loglevel="quiet",
             )
-            .run_async(pipe_stdout=True)
+            .run_async(pipe_stdout=True, pipe_stdin=bool(self.tee))
         )
+        self.__process = process
+        if self.tee:
+            feeder = Thread(target=self.__feed, args=(process.stdin,), daemon=True)
+            feeder.start()
         while not self.stopped():
-            if self.queue.full():
-                sleep(0.1)
-            else:
-                data = process.stdout.read(read_size)
-                if data:
-                    self.queue.put_nowait(data)
-                else:
+            size = self.__read_block(process.stdout, view)
+            if not size:
+                break
+            samples = size // block.itemsize
+            while not self.ring.wait_space(samples):
+                if self.stopped():
                     break
-        logging.debug("Reading finished.")
+            if self.stopped():
+                break
+            self.ring.write(block[:samples])
+            if size < len(view):
+                break
+        logging.debug(f"Reading finished. {self.ring.stats}")
+        if not self.stopped():
+            self.ring.close()
         process.terminate()
+
+    def __feed(self, stdin):
+        assert self.tee
+        try:
+            with Session.get(self.url, stream=True) as resp:
+                resp.raise_for_status()
+                if not self.tee.expected:
+                    self.tee.expected = int(resp.headers.get("Content-Length", 0))
+                for chunk in resp.iter_content(chunk_size=self.CHUNK_SIZE):
+                    if self.stopped():
+                        return self.tee.abort()
+                    stdin.write(chunk)
+                    self.tee.write(chunk)
+            self.tee.commit()
+        except (RequestException, OSError, ValueError) as e:
+            logging.debug(f"stream tee failed: {e}")
+            self.tee.abort()
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+
+    def __read_block(self, stdout, view: memoryview) -> int:
+        size = 0
+        while size < len(view):
+            read = stdout.readinto(view[size:])
+            if not read:
+                break
+            size += read
+        return size
@@ -1,11 +1,13 @@
-from queue import Empty
-import numpy as np
-import sounddevice as sd
-import logging
 from queue import Queue
+import logging
 from corethread import StoppableThread
 from threading import Event
+from time import perf_counter
+from typing import Callable, Optional
 from yanko.player.device import Device
+from yanko.player.engine import Engine
+from yanko.player.ringbuffer import RingBuffer
+from yanko.core.trace import LatencyTrace
 from yanko.sonic import Action
 import osascript
 
@@ -22,34 +24,39 @@ class Output(StoppableThread):
         end_event: Event,
         volume: int,
         muted: bool,
+        ring: Optional[RingBuffer] = None,
+        on_end: Optional[Callable[[], None]] = None,
         *args,
         **kwargs,
     ):
         self.volume = volume
         self.muted = muted
         self.paused = False
-        self.data_queue: Queue = Queue()
+        self.frames = 0
+        self.played_frames = 0
+        self.__anchor: tuple[int, float] = (0, 0)
+        self.ring = ring if ring else RingBuffer(
+            frames=Device.ringsize,
+            channels=Device.output_channels,
+            low_watermark=Device.low_watermark,
+        )
         self.control_queue: Queue = Queue()
         self.time_event = time_event
         self.end_event = end_event
-        self.init_stream()
+        self.on_end = on_end
+        self.drained = Event()
+        self.started = Event()
+        self.first_sample_at: float = 0
         super().__init__(*args, **kwargs)
 
-    def init_stream(self):
-        self.__stream = sd.RawOutputStream(
-            samplerate=Device.samplerate,
-            blocksize=Device.blocksize,
-            extra_settings=(
-                sd.CoreAudioSettings(
-                    change_device_parameters=True
-                )
-            ),
-            device=Device.index,
-            channels=Device.output_channels,
-            dtype="float32",
-            dither_off=True,
-            clip_off=True,
-        )
+    def stop(self):
+        super().stop()
+        self.started.set()
+        self.control_queue.put_nowait((None, None))
+
+    def drain(self):
+        self.drained.set()
+        self.control_queue.put_nowait((None, None))
 
     @property
     def volume(self) -> int:
@@ -72,53 +79,79 @@ class Output(StoppableThread):
 
     @property
     def samplesize(self) -> int:
-        return self.__stream.samplesize  # type: ignore
+        return Engine.samplesize
+
+    @property
+    def position(self) -> float:
+        """Position of the sample that is audible now, from the first frame
+        of the last block handed to the device and the time the device
+        reported it reaches the DAC, never ahead of the frames written."""
+        frames, at = self.__anchor
+        written = self.frames / Device.samplerate
+        if not at:
+            return written
+        return max(0, min(frames / Device.samplerate + perf_counter() - at, written))
+
+    @property
+    def played(self) -> float:
+        """Seconds handed to the device, seeks are not counted."""
+        return self.played_frames / Device.samplerate
+
+    def mark(self, frames: int, at: float):
+        self.__anchor = (frames, at)
+
+    def reset_clock(self, frames: int):
+        self.frames = frames
+        self.__anchor = (frames, 0)
 
     def run(self):
         logging.info("Output thead started")
-        self.__stream.start()
-        with self.__stream:
-            logging.debug(f"Buffering {Device.buffsize} blocks")
-            while self.needs_buffering:
-                sd.sleep(20)
-                self.needs_buffering = self.data_queue.qsize() < Device.buffsize
-            logging.debug(f"Buffered {self.data_queue.qsize()} blocks")
-            while not self.stopped():
-                try:
-                    if self.paused:
-                        sd.sleep(100)
-                    else:
-                        self.__output()
-                    self.__control()
-                except Empty:
-                    logging.debug(f"empty bufff {self.data_queue.qsize()}")
-                    break
-        logging.debug("Writing finished")
-        self.end_event.set()
-
-    def __output(self):
-        data = self.data_queue.get_nowait()
-        data_array = np.frombuffer(data, dtype="float32")
-        self.time_event.set()
-        self.__stream.write(data_array.tobytes())
-        self.data_queue.task_done()
-
-    def __control(self):
         try:
-            command, payload = self.control_queue.get_nowait()
-            match (command):
-                case Action.VOLUME_DOWN:
-                    self.volume = payload
-                case Action.VOLUME_UP:
-                    self.volume = payload
-                case Action.MUTE:
-                    self.muted = payload
-                case Action.PAUSE:
-                    self.paused = True
-                    self.time_event.clear()
-                case Action.RESUME:
-                    self.paused = False
-                case _:
-                    return None
-        except Empty:
+            self.__play()
+        finally:
+            Engine.detach(self)
+            logging.debug(f"Writing finished {self.ring.stats}")
+            self.end_event.set()
+            if self.on_end:
+                self.on_end()
+
+    def __play(self):
+        started = perf_counter()
+        threshold = self.__threshold()
+        logging.debug(f"Buffering {threshold} frames")
+        while not self.stopped() and not self.ring.wait_fill(threshold):
             pass
+        self.needs_buffering = False
+        logging.debug(f"Buffered {self.ring.fill_frames} frames")
+        Engine.attach(self)
+        self.started.wait(timeout=1)
+        if self.first_sample_at:
+            logging.debug(f"time to first sample -> {self.first_sample_at - started}s")
+            LatencyTrace.end("playback", at=self.first_sample_at)
+        while not self.stopped() and not self.drained.is_set():
+            command, payload = self.control_queue.get()
+            if command is None:
+                break
+            self.__control(command, payload)
+
+    def __threshold(self) -> int:
+        return min(
+            Device.buffsize * Device.blocksize,
+            self.ring.capacity // Device.output_channels // 2
+        )
+
+    def __control(self, command: Action, payload):
+        match (command):
+            case Action.VOLUME_DOWN:
+                self.volume = payload
+            case Action.VOLUME_UP:
+                self.volume = payload
+            case Action.MUTE:
+                self.muted = payload
+            case Action.PAUSE:
+                self.paused = True
+                self.time_event.clear()
+            case Action.RESUME:
+                self.paused = False
+            case _:
+                return None
@@ -0,0 +1,141 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Optional
+from requests.exceptions import RequestException
+from yanko.core.config import app_config
+from yanko.sonic.session import Session
+from .cache import AudioCache
+from .source import StreamSource
+
+
+class PrecacheMeta(type):
+
+    __instance: Optional["Precache"] = None
+
+    def __call__(cls, *args: Any, **kwds: Any) -> Any:
+        if not cls.__instance:
+            cls.__instance = type.__call__(cls, *args, **kwds)
+        return cls.__instance
+
+    def register(cls, source: StreamSource):
+        cls().set_source(source)
+
+    def schedule(cls, tracks: list[dict]):
+        cls().set_tracks(tracks)
+
+    def cancel(cls):
+        cls().set_tracks([])
+
+
+class Precache(object, metaclass=PrecacheMeta):
+    """Downloads the next tracks of the queue into the audio cache.
+
+    Each schedule replaces the window of wanted tracks. Downloads of tracks
+    that are still in the window keep running, the ones that left it stop
+    at the next chunk, and only tracks that are neither stored nor already
+    being downloaded get a new job."""
+
+    CHUNK_SIZE = 64 * 1024
+
+    __source: Optional[StreamSource] = None
+
+    def __init__(self) -> None:
+        config = app_config.get("precache", {})
+        self.__count = config.get("count", 3)
+        self.__max_bytes = config.get("max_bytes", 500 * 1024 ** 2)
+        self.__rate = config.get("rate", 0)
+        self.__executor = ThreadPoolExecutor(
+            max_workers=config.get("workers", 2),
+            thread_name_prefix="precache"
+        )
+        self.__window: set[str] = set()
+        self.__jobs: set[str] = set()
+        self.__lock = Lock()
+        self.__allowance = 0.0
+        self.__last_check = time.monotonic()
+
+    def set_source(self, source: StreamSource):
+        self.__source = source
+
+    def set_tracks(self, tracks: list[dict]):
+        source = self.__source
+        if not source or not AudioCache.enabled:
+            tracks = []
+        window: dict[str, dict] = {}
+        total = 0
+        for track in tracks[:self.__count]:
+            if not source or not source.isStreamable(track):
+                continue
+            key = source.cache_key(track.get("id"))
+            if AudioCache.stored(key):
+                continue
+            total += track.get("size", 0)
+            if total > self.__max_bytes:
+                break
+            window[key] = track
+        with self.__lock:
+            self.__window = set(window)
+            submit = [
+                (key, track)
+                for key, track in window.items()
+                if key not in self.__jobs
+            ]
+            self.__jobs.update(key for key, _ in submit)
+        for key, track in submit:
+            self.__executor.submit(self.__download, key, track)
+
+    def __isWanted(self, key: str) -> bool:
+        with self.__lock:
+            if key in self.__window:
+                return True
+            self.__jobs.discard(key)
+            return False
+
+    def __download(self, key: str, track: dict):
+        try:
+            self.__fetch(key, track)
+        finally:
+            with self.__lock:
+                self.__jobs.discard(key)
+
+    def __fetch(self, key: str, track: dict):
+        source = self.__source
+        if not source or not self.__isWanted(key):
+            return
+        song_id = track.get("id")
+        writer = AudioCache.writer(key, source.expected_size(track))
+        if not writer:
+            return
+        try:
+            logging.debug(f"precaching {song_id}")
+            with Session.get(source.url(song_id), stream=True) as resp:
+                resp.raise_for_status()
+                if not writer.expected:
+                    writer.expected = int(resp.headers.get("Content-Length", 0))
+                for chunk in resp.iter_content(chunk_size=self.CHUNK_SIZE):
+                    if not self.__isWanted(key):
+                        logging.debug(f"precaching {song_id} cancelled")
+                        return writer.abort()
+                    self.__throttle(len(chunk))
+                    writer.write(chunk)
+            writer.commit()
+        except (RequestException, OSError, ValueError) as e:
+            logging.debug(f"precaching {song_id} failed: {e}")
+            writer.abort()
+
+    def __throttle(self, size: int):
+        if not self.__rate:
+            return
+        with self.__lock:
+            now = time.monotonic()
+            self.__allowance = min(
+                self.__rate,
+                self.__allowance + (now - self.__last_check) * self.__rate
+            )
+            self.__last_check = now
+            self.__allowance -= size
+            delay = -self.__allowance / self.__rate if self.__allowance < 0 else 0
+        if delay:
+            time.sleep(delay)
@@ -0,0 +1,76 @@
+import logging
+from threading import Lock
+from typing import Callable, Optional
+from yanko.core.config import app_config
+from yanko.player.device import Device
+from .input import Input
+from .ringbuffer import RingBuffer
+
+
+class PrefetchMeta(type):
+
+    _instance: Optional["Prefetch"] = None
+
+    def __call__(cls, *args, **kwds):
+        if not cls._instance:
+            cls._instance = type.__call__(cls, *args, **kwds)
+        return cls._instance
+
+    @property
+    def seconds(cls) -> float:
+        return app_config.get("player", {}).get("prefetch", 10)
+
+    def load(cls, song_id: str, factory: Callable[[RingBuffer], Input]):
+        return cls().start(song_id, factory)
+
+    def take(cls, song_id: str) -> Optional[Input]:
+        return cls().pop(song_id)
+
+    def cancel(cls):
+        cls().clear()
+
+
+class Prefetch(object, metaclass=PrefetchMeta):
+
+    __song_id: Optional[str] = None
+    __reader: Optional[Input] = None
+
+    def __init__(self) -> None:
+        self.__lock = Lock()
+
+    def start(self, song_id: str, factory: Callable[[RingBuffer], Input]):
+        with self.__lock:
+            if self.__song_id == song_id:
+                return
+            self.__stop()
+            logging.debug(f"Prefetching {song_id}")
+            self.__song_id = song_id
+            self.__reader = factory(
+                RingBuffer(
+                    frames=Device.ringsize,
+                    channels=Device.output_channels,
+                    low_watermark=Device.low_watermark,
+                )
+            )
+            self.__reader.start()
+
+    def pop(self, song_id: str) -> Optional[Input]:
+        with self.__lock:
+            if self.__song_id != song_id:
+                self.__stop()
+                return None
+            reader = self.__reader
+            self.__song_id = None
+            self.__reader = None
+            logging.debug(f"Prefetched {song_id} warm with {reader.ring.stats}")
+            return reader
+
+    def clear(self):
+        with self.__lock:
+            self.__stop()
+
+    def __stop(self):
+        if self.__reader:
+            self.__reader.stop()
+        self.__reader = None
+        self.__song_id = None
@@ -0,0 +1,131 @@
+from threading import Event
+from typing import Optional
+import numpy as np
+from pydantic import BaseModel
+
+
+class RingBufferStats(BaseModel):
+    capacity: int
+    fill: int
+    underruns: int
+    stalls: int
+
+
+class RingBuffer(object):
+    """Single producer / single consumer float32 sample ring.
+
+    The producer only advances the write counter and the consumer only the
+    read counter, so neither side takes a lock. A producer that finds the
+    ring full sleeps until the consumer drains it to the low watermark and
+    then refills it in one burst, and a consumer waiting in wait_fill() is
+    woken by the write that reaches its target. flush() only marks how far
+    the consumer has to skip, so it is safe to call while the callback is
+    reading."""
+
+    def __init__(self, frames: int, channels: int, low_watermark: int = 0) -> None:
+        self.__channels = channels
+        self.__capacity = frames * channels
+        self.__low_watermark = min(low_watermark * channels, self.__capacity)
+        self.__buffer = np.zeros(self.__capacity, dtype=np.float32)
+        self.__written = 0
+        self.__read = 0
+        self.__flush_to: Optional[int] = None
+        self.__space = Event()
+        self.__waiting = False
+        self.__filled = Event()
+        self.__fill_target: Optional[int] = None
+        self.eof = False
+        self.underruns = 0
+        self.stalls = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.__capacity
+
+    @property
+    def fill(self) -> int:
+        if self.__flush_to is not None:
+            return self.__written - max(self.__read, self.__flush_to)
+        return self.__written - self.__read
+
+    @property
+    def space(self) -> int:
+        return self.__capacity - self.fill
+
+    @property
+    def fill_frames(self) -> int:
+        return self.fill // self.__channels
+
+    @property
+    def stats(self) -> RingBufferStats:
+        return RingBufferStats(
+            capacity=self.__capacity,
+            fill=self.fill,
+            underruns=self.underruns,
+            stalls=self.stalls,
+        )
+
+    def write(self, data: np.ndarray) -> int:
+        size = min(len(data), self.space)
+        start = self.__written % self.__capacity
+        first = min(size, self.__capacity - start)
+        self.__buffer[start:start + first] = data[:first]
+        if size > first:
+            self.__buffer[:size - first] = data[first:size]
+        self.__written += size
+        if self.__fill_target is not None and self.fill >= self.__fill_target:
+            self.__filled.set()
+        return size
+
+    def read_into(self, out: np.ndarray) -> int:
+        if self.__flush_to is not None:
+            self.__read = max(self.__read, self.__flush_to)
+            self.__flush_to = None
+        size = min(len(out), self.fill)
+        start = self.__read % self.__capacity
+        first = min(size, self.__capacity - start)
+        out[:first] = self.__buffer[start:start + first]
+        if size > first:
+            out[first:size] = self.__buffer[:size - first]
+        self.__read += size
+        if size < len(out) and not self.eof:
+            self.underruns += 1
+        if self.__waiting and self.fill <= self.__low_watermark:
+            self.__space.set()
+        return size
+
+    def wait_space(self, size: int, timeout: float = 0.5) -> bool:
+        if self.space >= size:
+            return True
+        self.__space.clear()
+        self.__waiting = True
+        try:
+            if self.space >= size:
+                return True
+            self.stalls += 1
+            return self.__space.wait(timeout) and self.space >= size
+        finally:
+            self.__waiting = False
+
+    def wait_fill(self, frames: int, timeout: float = 0.5) -> bool:
+        target = min(frames * self.__channels, self.__capacity)
+        if self.eof or self.fill >= target:
+            return True
+        self.__filled.clear()
+        self.__fill_target = target
+        try:
+            if self.eof or self.fill >= target:
+                return True
+            return self.__filled.wait(timeout) and (self.eof or self.fill >= target)
+        finally:
+            self.__fill_target = None
+
+    def flush(self):
+        self.__flush_to = self.__written
+        self.eof = False
+        self.__space.set()
+
+    def close(self):
+        self.eof = True
+        self.__space.set()
+        self.__filled.set()
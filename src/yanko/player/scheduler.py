@@ -0,0 +1,103 @@
+from threading import Event
+from time import perf_counter
+from typing import Callable, Optional, Sequence
+import numpy as np
+from pydantic import BaseModel
+
+
+class JitterStats(BaseModel):
+    beats: int
+    missed: int
+    mean: float
+    p95: float
+    max: float
+
+
+class BeatScheduler(object):
+    """Beat times in a sorted numpy array with a cursor to the next one.
+
+    next_beat() sleeps until the beat under the cursor is due on the given
+    clock and returns its index. load(), reindex() and wake() interrupt the
+    sleep, reindex() moves the cursor with searchsorted so a seek or a
+    resume costs O(log n). Beats that are already more than LATE seconds
+    behind the clock are skipped instead of fired and a clock that jumped
+    back moves the cursor back with it."""
+
+    LATE = 0.07
+
+    def __init__(self, clock: Callable[[], float], late: Optional[float] = None):
+        self.__clock = clock
+        self.__late = self.LATE if late is None else late
+        self.__beats = np.empty(0, dtype=np.float64)
+        self.__cursor = 0
+        self.__wake = Event()
+
+    def __len__(self) -> int:
+        return len(self.__beats) - self.__cursor
+
+    @property
+    def beats(self) -> np.ndarray:
+        return self.__beats
+
+    @property
+    def cursor(self) -> int:
+        return self.__cursor
+
+    def load(self, beats: Sequence[float] | np.ndarray):
+        self.__beats = np.sort(np.asarray(beats, dtype=np.float64))
+        self.reindex()
+
+    def reindex(self):
+        self.__cursor = int(
+            np.searchsorted(self.__beats, self.__clock() - self.__late, side="left")
+        )
+        self.__wake.set()
+
+    def wake(self):
+        self.__wake.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        woken = self.__wake.wait(timeout)
+        self.__wake.clear()
+        return woken
+
+    def next_beat(self) -> Optional[int]:
+        if self.__cursor and self.__beats[self.__cursor - 1] > self.__clock() + self.__late:
+            self.reindex()
+        if self.__cursor >= len(self.__beats):
+            return None
+        delay = self.__beats[self.__cursor] - self.__clock()
+        if delay > 0 and self.wait(delay):
+            return None
+        now = self.__clock()
+        due = int(np.searchsorted(self.__beats, now - self.__late, side="left"))
+        if due > self.__cursor:
+            self.__cursor = due
+            return None
+        if self.__beats[self.__cursor] > now:
+            return None
+        idx = self.__cursor
+        self.__cursor += 1
+        return idx
+
+
+def measure_jitter(bpm: float = 120, seconds: float = 10) -> JitterStats:
+    """Runs a scheduler on a perf_counter clock over static beats and
+    reports how late each beat fired."""
+    origin = perf_counter()
+    scheduler = BeatScheduler(clock=lambda: perf_counter() - origin)
+    beats = np.arange(0.05, seconds, 60 / bpm)
+    scheduler.load(beats)
+    fired: dict[int, float] = {}
+    while len(scheduler):
+        idx = scheduler.next_beat()
+        if idx is not None:
+            fired[idx] = perf_counter() - origin - beats[idx]
+    delays = np.array(list(fired.values()) or [0.0])
+    return JitterStats(
+        beats=len(beats),
+        missed=len(beats) - len(fired),
+        mean=float(np.mean(delays)),
+        p95=float(np.percentile(delays, 95)),
+        max=float(np.max(delays)),
+    )
@@ -0,0 +1,43 @@
+from typing import Optional
+from urllib.parse import parse_qs, urlencode, urlparse
+from yanko.sonic import StreamFormat
+
+
+class StreamSource(object):
+
+    UNSTREAMABLE_SUFFIXES = ["m4a", "mp4", "alac"]
+
+    def __init__(self, stream_url: str, format: StreamFormat) -> None:
+        self.__url = stream_url
+        self.__format = format
+
+    @property
+    def format(self) -> StreamFormat:
+        return self.__format
+
+    @property
+    def isTranscoded(self) -> bool:
+        return self.__format not in [StreamFormat.NONE, StreamFormat.RAW]
+
+    def cache_key(self, song_id) -> str:
+        return f"{song_id}_{self.__format.value}"
+
+    def expected_size(self, track: dict) -> Optional[int]:
+        if self.isTranscoded:
+            return None
+        return track.get("size")
+
+    def isStreamable(self, track: dict) -> bool:
+        if self.isTranscoded:
+            return True
+        return track.get("suffix") not in self.UNSTREAMABLE_SUFFIXES
+
+    def url(self, song_id, offset: float = 0) -> str:
+        url = urlparse(self.__url)
+        query = parse_qs(url.query)
+        query = dict(id=song_id, format=self.__format.value, **query)
+        if self.__format == StreamFormat.NONE:
+            del query["format"]
+        if offset and self.isTranscoded:
+            query["timeOffset"] = int(offset)
+        return f"{url.scheme}://{url.netloc}{url.path}?{urlencode(query, doseq=True)}"
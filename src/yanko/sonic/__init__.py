@@ -8,6 +8,7 @@ import pantomime
 from corestring import truncate
 from coretime import seconds_to_duration
 from yanko.player.bpm import BeatsStruct
+from yanko.player.engine import Engine
 
 RESULT_KEYS = [
     "searchResult3",
@@ -78,6 +79,7 @@ class Command(Enum):
     ANNOUNCE = "announce"
     PLAYER_RESPONSE = "player_response"
     SHARE = "share"
+    SEEK = "seek"
 
 
 class Action(Enum):
@@ -92,6 +94,8 @@ class Action(Enum):
     VOLUME_UP = "vol_up"
     VOLUME_DOWN = "vol_down"
     MUTE = "mute"
+    SEEK = "seek"
+    ENDED = "ended"
 
 
 class Status(Enum):
@@ -288,9 +292,16 @@ class NowPlaying(BaseModel):
         td = timedelta(seconds=int(self.track.duration))
         return str(td)[2:7]
 
+    @property
+    def position(self) -> float:
+        position = Engine.position
+        if position is None:
+            return (datetime.now(tz=timezone.utc) - self.start).total_seconds()
+        return position
+
     @property
     def current_position(self) -> str:
-        td = datetime.now(tz=timezone.utc) - self.start
+        td = timedelta(seconds=int(self.position))
         return str(td)[2:7]
 
     @property
@@ -307,6 +318,10 @@ class NowPlaying(BaseModel):
             return None
 
 
+class SongInfo(BaseModel):
+    song: Song
+
+
 class Playlist(BaseModel):
     tracks: list[Track]
     start: datetime
@@ -320,6 +335,10 @@ class Playstatus(BaseModel):
     status: Status
 
 
+class PlaybackPosition(BaseModel):
+    position: float
+
+
 class VolumeStatus(BaseModel):
     volume: float
     muted: bool
@@ -388,6 +407,17 @@ class Search(BaseModel):
     items: list[SearchItem]
 
 
+class SearchIcon(BaseModel):
+    queue_id: str
+    uid: str
+    path: Optional[str] = None
+
+
+class SearchDone(BaseModel):
+    queue_id: str
+    done: bool = True
+
+
 class ScanStatus(BaseModel):
     scanning: bool
     count: int
@@ -3,6 +3,7 @@ import string
 import sys
 import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from queue import Queue
 from random import SystemRandom, choice
@@ -15,7 +16,10 @@ from yanko.core import perftime
 from yanko.core.config import app_config
 from yanko.core.thread import StoppableThread
 from yanko.player.bpm import BeatsStruct
+from yanko.player.cache import AudioCache
 from yanko.player.ffmpeg import FFMPeg
+from yanko.player.precache import Precache
+from yanko.player.source import StreamSource
 from yanko.sonic import (
     RESULT_KEYS,
     Album,
@@ -42,6 +46,7 @@ from yanko.sonic import (
     Search3Response,
     SearchItemIcon,
     Song,
+    SongInfo,
     Status,
     Subsonic,
     Track,
@@ -49,14 +54,47 @@ from yanko.sonic import (
     VolumeStatus,
 )
 from yanko.sonic.artist import ArtistInfo
-from yanko.sonic.beats import Beats
+from yanko.sonic.scrobbler import Scrobbler
+from yanko.sonic.beats import Beats, Fetcher
 from yanko.sonic.playqueue import PlayQueue
+from yanko.sonic.metadata import MetadataStore
+from yanko.sonic.library import LibraryIndex
+from yanko.sonic.resolver import Resolver
+from yanko.sonic.driver import PlaybackDriver
+from yanko.sonic.session import Session
 from pydantic import BaseModel
-from yanko.core.cachable import timed_lru_cache
+from yanko.core.trace import LatencyTrace
+from yanko.core.cachable import ResponseCache
 
 urllib3.disable_warnings()
 
 
+RESPONSE_TTL = {
+    Subsonic.ALBUM.value: 3600,
+    Subsonic.ARTIST.value: 3600,
+    Subsonic.ARTISTS.value: 3600,
+    Subsonic.ARTIST_INFO.value: 86400,
+    Subsonic.SONG.value: 3600,
+    Subsonic.TOP_SONGS.value: 3600,
+    Subsonic.PLAYLIST.value: 60,
+    Subsonic.SEARCH3.value: 300,
+    Subsonic.ALBUM_LIST.value: 20,
+    Subsonic.RANDOM_SONGS.value: 0,
+    Subsonic.SIMILAR_SONGS2.value: 0,
+    Subsonic.SCROBBLE.value: 0,
+    Subsonic.START_SCAN.value: 0,
+    Subsonic.GET_SCAN_STATUS.value: 0,
+    Subsonic.CREATE_SHARE.value: 0,
+    Subsonic.PING.value: 0,
+}
+
+ALBUM_LIST_RESPONSES = {
+    AlbumType.NEWEST: LastAdded,
+    AlbumType.RECENT: RecentlyPlayed,
+    AlbumType.FREQUENT: MostPlayed,
+}
+
+
 class ApiArguments(BaseModel):
     u: str
     t: str
@@ -66,27 +104,31 @@ class ApiArguments(BaseModel):
     f: str = "json"
 
 
-def get_scan_status(url, manager_queue: Queue):
+def get_scan_status(url, manager_queue: Queue, on_complete=None):
     while True:
         time.sleep(2)
-        res = requests.get(url)
+        res = Session.get(url)
         data = res.json()
         response: ScanStatusResponse = ScanStatusResponse(
             **data.get("subsonic-response")
         )
         assert response.scanStatus
         status: ScanStatus = response.scanStatus
+        if not status.scanning and on_complete:
+            on_complete()
         manager_queue.put_nowait((Command.PLAYER_RESPONSE, status))
         if not status.scanning:
             break
 
 
-@timed_lru_cache(seconds=20)
 def make_request(url):
     try:
         logging.debug(f"make_request: {url}")
-        r = requests.get(url=url)
+        r = Session.get(url)
         return r
+    except requests.exceptions.Timeout as e:
+        logging.warning(f"make_request timed out: {e}")
+        return None
     except requests.exceptions.ConnectionError as e:
         logging.exception(e)
         sys.exit(1)
@@ -109,6 +151,7 @@ class Client(object):
     __format: StreamFormat
 
     BATCH_SIZE = 20
+    WORKERS = 4
 
     def __init__(self, manager_queue, time_event):
         server_config = app_config.get("server", {})
@@ -119,11 +162,21 @@ class Client(object):
         self.ssl = server_config.get("ssl", False)
         self.verify_ssl = server_config.get("verify_ssl", False)
         self.token, self.salt = self.hash_password()
+        self.session = Session()
+
+        cache_config = app_config.get("cache", {})
+        self.cache = ResponseCache(
+            maxsize=cache_config.get("maxsize", 256),
+            ttl={**RESPONSE_TTL, **cache_config.get("ttl", {})},
+        )
 
         self.search_results = []
 
         streaming_config = app_config.get("streaming", {})
         self.__format = StreamFormat(streaming_config.get("format", False))
+        Precache.register(
+            StreamSource(self.create_url(Subsonic.STREAM), self.__format)
+        )
 
         self.command_queue = Queue()
         input_thread = StoppableThread(target=self.add_input)
@@ -132,6 +185,9 @@ class Client(object):
         self.__threads.append(input_thread)
 
         self.search_queue = Queue()
+        self.__workers = ThreadPoolExecutor(
+            max_workers=self.WORKERS, thread_name_prefix="resolve"
+        )
         search_thread = StoppableThread(target=self.add_search)
         search_thread.daemon = True
         search_thread.start()
@@ -141,6 +197,21 @@ class Client(object):
         self.manager_queue = manager_queue
         self.time_event = time_event
         self.playqueue = PlayQueue(manager_queue)
+        self.metadata = MetadataStore()
+        self.library = LibraryIndex(loader=self.__library_page)
+        if not self.library.ready:
+            self.library.refresh()
+
+        self.__threads.append(
+            Scrobbler.register(
+                url_factory=lambda **kw: self.create_url(Subsonic.SCROBBLE, **kw),
+                on_submit=self.__onScrobbled,
+            )
+        )
+
+        self.driver = PlaybackDriver(self)
+        self.driver.start()
+        self.__threads.append(self.driver)
 
     @property
     def api_args(self) -> dict[str, str]:
@@ -218,16 +289,21 @@ class Client(object):
         return token, salt
 
     def create_url(self, endpoint: Subsonic, **kwargs):
-        qs = urlencode({**kwargs, **self.api_args})
+        qs = urlencode({**kwargs, **self.api_args}, doseq=True)
         return f"https://{self.host}/rest/{endpoint.value}?{qs}"
 
     def make_request(self, url, usecache=True):
+        if usecache and (cached := self.cache.get(url)) is not None:
+            return cached
         try:
             r = make_request(url=url)
         except requests.exceptions.ConnectionError as e:
             logging.exception(e)
             sys.exit(1)
 
+        if r is None:
+            return None
+
         try:
             response = r.json()
             logging.debug(response)
@@ -249,23 +325,46 @@ class Client(object):
             )
             return None
 
-        for k, v in subsonic_response.items():
-            if k in RESULT_KEYS:
-                return v
-        return response
+        result = next(
+            (v for k, v in subsonic_response.items() if k in RESULT_KEYS),
+            response
+        )
+        if usecache:
+            self.cache.set(url, result)
+        return result
 
     def scrobble(self, song_id):
-        self.make_request(self.create_url(Subsonic.SCROBBLE, id=song_id))
+        Scrobbler.now_playing(song_id)
+
+    def __onScrobbled(self):
+        self.cache.invalidate(Subsonic.ALBUM_LIST.value)
+        self.metadata.invalidate("albumList")
 
     def startScan(self):
-        make_request.cache_clear()
+        self.cache.invalidate()
         self.make_request(self.create_url(Subsonic.START_SCAN))
         url = self.create_url(Subsonic.GET_SCAN_STATUS)
         get_status = StoppableThread(
-            target=get_scan_status, args=(url, self.manager_queue)
+            target=get_scan_status,
+            args=(url, self.manager_queue, self.__onScanComplete)
         )
         get_status.start()
 
+    def __onScanComplete(self):
+        self.cache.invalidate()
+        self.metadata.invalidate()
+        self.library.refresh()
+        Resolver.forget()
+
+    def __library_page(self, kind: str, size: int, offset: int) -> Optional[dict]:
+        counts = {f"{k}Count": 0 for k in LibraryIndex.KINDS}
+        url = self.create_url(
+            Subsonic.SEARCH3,
+            query="",
+            **{**counts, f"{kind}Count": size, f"{kind}Offset": offset},
+        )
+        return self.make_request(url, usecache=False)
+
     def createShare(self, id: str) -> Optional[Share]:
         url = self.create_url(Subsonic.CREATE_SHARE, id=id, downloadable="true")
         logging.debug(url)
@@ -280,50 +379,52 @@ class Client(object):
 
     def search(self, query):
         with perftime("search"):
-            results = self.make_request(
-                self.create_url(Subsonic.SEARCH3, query=query))
-            if results:
-                results = Search3Response(**results)
-                response = []
-                for artist in results.artist:
-                    iconUrl = self.create_url(
-                        Subsonic.ARTIST_INFO, id=artist.id)
-                    response.append(
-                        ArtistSearchItem(
-                            uid=artist.id,
-                            title=artist.name.upper(),
-                            subtitle=f"Total albums: {artist.albumCount}",
-                            arg=f"artist={artist.id}",
-                            icon=SearchItemIcon(path=iconUrl),
-                        )
+            results = self.library.search(query)
+            if results is None:
+                response = self.make_request(
+                    self.create_url(Subsonic.SEARCH3, query=query))
+                if not response:
+                    return []
+                results = Search3Response(**response)
+            response = []
+            for artist in results.artist:
+                iconUrl = self.create_url(
+                    Subsonic.ARTIST_INFO, id=artist.id)
+                response.append(
+                    ArtistSearchItem(
+                        uid=artist.id,
+                        title=artist.name.upper(),
+                        subtitle=f"Total albums: {artist.albumCount}",
+                        arg=f"artist={artist.id}",
+                        icon=SearchItemIcon(path=iconUrl),
                     )
-                for album in results.album:
-                    iconUrl = self.create_url(
-                        Subsonic.COVER_ART, id=album.id, size=200)
-                    response.append(
-                        AlbumSearchItem(
-                            uid=album.id,
-                            title=album.title.upper(),
-                            subtitle=album.artist,
-                            arg=f"album={album.id}",
-                            icon=SearchItemIcon(path=iconUrl),
-                        )
-                    )
-                for track in results.song:
-                    iconUrl = self.create_url(
-                        Subsonic.COVER_ART, id=track.coverArt, size=200
+                )
+            for album in results.album:
+                iconUrl = self.create_url(
+                    Subsonic.COVER_ART, id=album.id, size=200)
+                response.append(
+                    AlbumSearchItem(
+                        uid=album.id,
+                        title=album.title.upper(),
+                        subtitle=album.artist,
+                        arg=f"album={album.id}",
+                        icon=SearchItemIcon(path=iconUrl),
                     )
-                    response.append(
-                        TrackSearchItem(
-                            uid=track.id,
-                            title=track.title,
-                            subtitle=f"{track.artist} / {track.album}",
-                            arg=f"albumsong={track.albumId}/{track.id}",
-                            icon=SearchItemIcon(path=iconUrl),
-                        )
+                )
+            for track in results.song:
+                iconUrl = self.create_url(
+                    Subsonic.COVER_ART, id=track.coverArt, size=200
+                )
+                response.append(
+                    TrackSearchItem(
+                        uid=track.id,
+                        title=track.title,
+                        subtitle=f"{track.artist} / {track.album}",
+                        arg=f"albumsong={track.albumId}/{track.id}",
+                        icon=SearchItemIcon(path=iconUrl),
                     )
-                return response
-        return []
+                )
+            return response
 
     def get_artists(self):
         artists = self.make_request(url=self.create_url(Subsonic.ARTISTS))
@@ -332,9 +433,15 @@ class Client(object):
         return []
 
     def get_album_list(self, album_type: AlbumType):
-        albums = self.make_request(
-            self.create_url(Subsonic.ALBUM_LIST, type=album_type.value)
-        )
+        url = self.create_url(Subsonic.ALBUM_LIST, type=album_type.value)
+        if album_type in ALBUM_LIST_RESPONSES:
+            albums = self.metadata.album_list(
+                album_type.value,
+                loader=lambda: self.make_request(url, usecache=False),
+                on_update=lambda data: self.__onAlbumListUpdate(album_type, data)
+            )
+        else:
+            albums = self.make_request(url)
         if albums:
             return albums.get("album", [])
         return []
@@ -358,8 +465,11 @@ class Client(object):
         return top_songs.get("song")
 
     def get_album_tracks(self, album_id):
-        album_info = self.make_request(
-            self.create_url(Subsonic.ALBUM, id=album_id))
+        url = self.create_url(Subsonic.ALBUM, id=album_id)
+        album_info = self.metadata.album(
+            album_id,
+            loader=lambda: self.make_request(url, usecache=False)
+        )
         logging.info(album_info)
         if not album_info:
             return None
@@ -367,16 +477,22 @@ class Client(object):
         return songs
 
     def get_song_data(self, song_id) -> Song:
-        song_data = self.make_request(
-            self.create_url(Subsonic.SONG, id=song_id))
+        url = self.create_url(Subsonic.SONG, id=song_id)
+        song_data = self.metadata.song(
+            song_id,
+            loader=lambda: self.make_request(url, usecache=False)
+        )
         logging.warning(song_data)
         return Song(**song_data)  # type:ignore
 
     def get_artist(self, artist_id) -> Optional[Artist]:
         if not artist_id:
             return None
-        artist_info = self.make_request(
-            self.create_url(Subsonic.ARTIST, id=artist_id))
+        url = self.create_url(Subsonic.ARTIST, id=artist_id)
+        artist_info = self.metadata.artist(
+            artist_id,
+            loader=lambda: self.make_request(url, usecache=False)
+        )
         if not artist_info:
             return None
         return Artist(**artist_info)  # type: ignore
@@ -400,100 +516,35 @@ class Client(object):
                 Subsonic.COVER_ART, id=album.id, size=200)
         return albums
 
-    def play_random_songs(self, fetch=True):
-        if fetch:
-            self.playqueue.skip_to = None
-            random_songs = self.make_request(
-                self.create_url(
-                    Subsonic.RANDOM_SONGS, size=self.BATCH_SIZE, ts=time.time()
-                )
-            )
-            if not random_songs:
-                return
-            logging.warning(random_songs)
-            self.playqueue.load(random_songs.get("song", []))
-        for song in self.playqueue:
-            playing = self.play_stream(dict(song))
-            if not playing:
-                return
-        return self.play_random_songs(not self.playqueue.skip_to)
-
-    def play_radio(self, radio_id, fetch=True):
-        if fetch:
-            similar_songs = self.make_request(
-                self.create_url(
-                    Subsonic.SIMILAR_SONGS2,
-                    id=radio_id,
-                    count=self.BATCH_SIZE,
-                    ts=time.time(),
-                )
+    def get_random_songs(self) -> list[dict]:
+        random_songs = self.make_request(
+            self.create_url(
+                Subsonic.RANDOM_SONGS, size=self.BATCH_SIZE, ts=time.time()
             )
-            if not similar_songs:
-                return
-            songs = similar_songs.get("song", [])
-            self.playqueue.load(songs)
-        for radio_track in self.playqueue:
-            playing = self.play_stream(dict(radio_track))
-            if not playing:
-                return
-        return self.play_radio(radio_id, not self.playqueue.skip_to)
-
-    def play_artist(self, artist_id, fetch=True):
-        try:
-            if fetch:
-                top_songs = self.get_top_songs(artist_id)
-                self.playqueue.load(top_songs)
-            for song in self.playqueue:
-                playing = self.play_stream(dict(song))
-                assert playing
-            return self.play_artist(artist_id, not self.playqueue.skip_to)
-        except AssertionError:
-            return
-
-    def play_last_added(self):
-        last_added = self.get_last_added()
-        self.manager_queue.put_nowait(
-            (Command.PLAYER_RESPONSE, LastAdded(albums=last_added))
         )
-        albums = list(reversed(last_added))
-        while album := albums.pop():
-            play_next = self.play_album(album.id, endless=len(albums) == 0)
-            if not play_next:
-                break
-
-    def play_most_played(self):
-        most_player = self.get_most_played()
-        self.manager_queue.put_nowait(
-            (Command.PLAYER_RESPONSE, MostPlayed(albums=most_player))
+        if not random_songs:
+            return []
+        return random_songs.get("song", [])
+
+    def get_similar_songs(self, radio_id) -> list[dict]:
+        similar_songs = self.make_request(
+            self.create_url(
+                Subsonic.SIMILAR_SONGS2,
+                id=radio_id,
+                count=self.BATCH_SIZE,
+                ts=time.time(),
+            )
         )
-        albums = list(reversed(most_player))
-        while album := albums.pop():
-            play_next = self.play_album(album.id, endless=len(albums) == 0)
-            if not play_next:
-                break
-
-    def play_album(self, album_id, endless=True, fetch=True):
-        if fetch:
-            songs = self.get_album_tracks(album_id)
-            self.playqueue.load(songs)
-
-        artist_id = None
-
-        for song in self.playqueue:
-            artist_id = song.get("artistId")
-            playing = self.play_stream(dict(song))
-            if not playing:
-                return
-        if self.playqueue.skip_to:
-            return self.play_album(album_id, endless=endless)
-        return self.play_radio(artist_id)
+        if not similar_songs:
+            return []
+        return similar_songs.get("song", [])
 
-    def play_random_album(self):
+    def get_random_album_id(self) -> Optional[str]:
         albums = self.get_album_list(AlbumType.RANDOM)
         if not albums:
             return None
         album = choice(albums)  # type: ignore
-        return self.play_album(album.get("id"))
+        return album.get("id")
 
     def play_playlist(self, playlist_id):
         playlist_info = self.make_request(
@@ -524,7 +575,6 @@ class Client(object):
         if not song_id:
             logging.error(f"NO SONG ID {track_data}")
             return False
-        self.scrobble(song_id)
 
         try:
             coverArt = track_data.get("coverArt")
@@ -533,17 +583,24 @@ class Client(object):
                 coverArtUrl = self.create_url(
                     Subsonic.COVER_ART, id=coverArt, size=500)
 
+            self.scrobble(song_id)
+            upcoming = self.playqueue.upcoming
+            Fetcher.prioritize(
+                track_data.get("path"),
+                upcoming.get("path") if upcoming else None
+            )
             self.manager_queue.put_nowait(
                 (
                     Command.PLAYER_RESPONSE,
                     NowPlaying(
                         start=datetime.now(tz=timezone.utc),
                         track=Track(**{**track_data, "coverArt": coverArtUrl}),  # type: ignore
-                        song=self.get_song_data(song_id),
+                        song=Song(**track_data),
                         beats=self.load_beats(track_data.get("path", "")),
                     ),
                 )
             )
+            self.__workers.submit(self.__onSongData, song_id)
 
             self.player = FFMPeg(
                 queue=self.playback_queue,
@@ -553,12 +610,25 @@ class Client(object):
                 track_data=track_data,
                 volume=self.volume,
                 muted=self.muted,
-                format=self.__format
+                format=self.__format,
+                next_track=upcoming,
             )
 
             self.playqueue.last_id = song_id
-
+            self.session.log_stats(f"track change {song_id}")
+            logging.debug(f"response cache -> {self.cache.stats}")
+            logging.debug(f"audio cache -> {AudioCache.stats}")
+            logging.debug(f"latency -> {LatencyTrace.stats}")
+            logging.debug(f"scrobbler -> {Scrobbler.stats}")
+            logging.debug(f"beats -> {Fetcher.stats}")
+
+            started = time.time()
             self.status = self.player.play()
+            if Scrobbler.should_submit(
+                duration=track_data.get("duration", 0),
+                played=self.player.played
+            ):
+                Scrobbler.played(song_id, started)
 
             match (self.status):
                 case Status.NEXT:
@@ -584,65 +654,51 @@ class Client(object):
 
     def add_input(self):
         while True:
-            if self.command_queue.empty():
-                time.sleep(0.1)
-                continue
-            cmd, payload = self.command_queue.get_nowait()
+            cmd, payload = self.command_queue.get()
             self.command_queue.task_done()
+            if cmd is None:
+                break
             match (cmd):
-                case Command.RANDOM:
-                    self.play_random_songs()
-                case Command.PLAYLIST:
-                    self.play_random_songs(fetch=False)
-                case Command.RANDOM_ALBUM:
-                    self.playqueue.skip_to = None
-                    self.play_random_album()
-                case Command.ALBUM:
-                    self.play_album(payload)
-                case Command.ARTIST:
-                    self.play_artist(payload)
-                case Command.PLAY_LAST_ADDED:
-                    self.play_last_added()
-                case Command.PLAY_MOST_PLAYED:
-                    self.play_most_played()
-                case Command.SONG:
-                    self.playqueue.skip_to = payload
                 case Command.SEARCH:
-                    self.manager_queue.put_nowait(
-                        (
-                            Command.PLAYER_RESPONSE,
-                            Search(
-                                queue_id=string_hash(payload),
-                                items=self.search(payload),
-                            ),
-                        )
-                    )
+                    self.search_queue.put_nowait((cmd, payload))
+                case _:
+                    self.driver.queue.put_nowait((cmd, payload))
 
     def add_search(self):
         while True:
-            if self.search_queue.empty():
-                time.sleep(0.1)
-                continue
-            cmd, payload = self.search_queue.get_nowait()
+            cmd, payload = self.search_queue.get()
+            self.search_queue.task_done()
+            if cmd is None:
+                break
+            self.__workers.submit(self.__resolve, cmd, payload)
+
+    def __resolve(self, cmd: Command, payload):
+        try:
             match (cmd):
                 case Command.SEARCH:
+                    query, queue_id = (
+                        payload
+                        if isinstance(payload, tuple)
+                        else (payload, string_hash(payload))
+                    )
                     self.manager_queue.put_nowait(
                         (
                             Command.PLAYER_RESPONSE,
                             Search(
-                                queue_id=string_hash(payload),
-                                items=self.search(payload),
+                                queue_id=queue_id,
+                                items=self.search(query),
                             ),
                         )
                     )
                 case Command.ARTIST_ALBUMS:
+                    artist_info, albums = Session.gather(
+                        lambda: self.get_artist_info(payload),
+                        lambda: self.get_artist_albums(payload),
+                    )
                     self.manager_queue.put_nowait(
                         (
                             Command.PLAYER_RESPONSE,
-                            ArtistAlbums(
-                                artistInfo=self.get_artist_info(payload),
-                                albums=self.get_artist_albums(payload),
-                            ),
+                            ArtistAlbums(artistInfo=artist_info, albums=albums),
                         )
                     )
                 case Command.RESCAN:
@@ -675,7 +731,8 @@ class Client(object):
                             self.createShare(payload)
                         )
                     )
-            self.search_queue.task_done()
+        except Exception as e:
+            logging.exception(e)
 
     def exit(self):
         try:
@@ -688,6 +745,26 @@ class Client(object):
                 th.stop()
             except Exception:
                 pass
+        self.command_queue.put_nowait((None, None))
+        self.search_queue.put_nowait((None, None))
+        self.__workers.shutdown(wait=False, cancel_futures=True)
+
+    def __onSongData(self, song_id: str):
+        try:
+            self.manager_queue.put_nowait(
+                (Command.PLAYER_RESPONSE, SongInfo(song=self.get_song_data(song_id)))
+            )
+        except Exception as e:
+            logging.debug(f"song data for {song_id} failed: {e}")
+
+    def __onAlbumListUpdate(self, album_type: AlbumType, data: dict):
+        response = ALBUM_LIST_RESPONSES[album_type]
+        self.manager_queue.put_nowait(
+            (
+                Command.PLAYER_RESPONSE,
+                response(albums=self.__toAlbums(lambda: data.get("album", []))),
+            )
+        )
 
     def __toAlbums(self, fnc, *args):
         return [
@@ -2,8 +2,9 @@ from urllib.parse import urlparse, parse_qs
 from hashlib import blake2b
 from yanko.sonic import ArtistInfo as ArtistInfoData, ArtistInfo as ArtistInfoResponse
 from yanko.core.cachable import CachableDb
+from yanko.core.singleflight import SingleFlight
 from yanko.db.models import ArtistInfo as ArtistInfoModel
-import requests
+from yanko.sonic.session import Session
 from typing import Optional
 import logging
 
@@ -14,6 +15,7 @@ class ArtistInfo(CachableDb):
     _id = None
     _artist_id = None
     _struct: Optional[ArtistInfoModel] = None
+    flights = SingleFlight()
 
     def __init__(self, url) -> None:
         self._url = url
@@ -44,7 +46,7 @@ class ArtistInfo(CachableDb):
 
     def _fetch(self):
         try:
-            rq = requests.get(self._url)
+            rq = Session.get(self._url)
             json = rq.json()
             assert json
             info = json.get("subsonic-response", {}).get("artistInfo2", None)
@@ -57,9 +59,19 @@ class ArtistInfo(CachableDb):
 
     @property
     def info(self) -> Optional[ArtistInfoData]:
-        isLoaded = self.load()
-        if not isLoaded:
-            self._fetch()
+        with __class__.flights.hold(self.artist_id):
+            isLoaded = self.load()
+            if not isLoaded:
+                self._fetch()
+        if self._struct:
+            return ArtistInfoData(**self._struct.to_dict())
+        return None
+
+    @property
+    def cached_info(self) -> Optional[ArtistInfoData]:
+        if not self.isCached:
+            return None
+        self._struct = self.fromcache()
         if self._struct:
             return ArtistInfoData(**self._struct.to_dict())
         return None
@@ -1,11 +1,17 @@
-from queue import Queue, Empty
+import heapq
+import multiprocessing
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from functools import partial
+from itertools import count
+from pydantic import BaseModel
+from queue import Queue
+from threading import Condition, Semaphore, Thread
 from yanko.core.cachable import CachableDb
 from yanko.core.config import app_config
 from yanko.core.thread import StoppableThread
 from yanko.db.models import Beats as BeatsModel
-from yanko.player.bpm import Beats as BeatsExtractor, BeatsStruct
-from time import sleep
-from typing import Optional
+from yanko.player.bpm import Beats as BeatsExtractor, BeatsStruct, extract_job
+from typing import Callable, Optional
 import logging
 from yanko.sonic import Command
 
@@ -18,13 +24,15 @@ class Beats(CachableDb):
         self,
         path,
         allow_extract: Optional[bool] = None,
-        extractor: Optional[BeatsExtractor] = None
+        extractor: Optional[BeatsExtractor] = None,
+        on_partial: Optional[Callable[[BeatsStruct], None]] = None
     ) -> None:
         self.__path = path.split("Music/")[-1]
         if allow_extract is None:
             allow_extract = app_config.get("beats", {}).get("extract", False)
         self.__allow_extract = allow_extract
         self.__extractor = extractor
+        self.__on_partial = on_partial
         super().__init__(
             model=BeatsModel,  # type: ignore
             id_key="path",
@@ -84,11 +92,11 @@ class Beats(CachableDb):
             self.__extractor = BeatsExtractor(self.__path)
         result = None
         result = self.__extractor.fast_bpm().dict()
-        result["path"] = self.__path
         if self.__allow_extract:
             logging.debug(f"Extracting beats for {self.__path}")
-            result = self.__extractor.extract().dict()
-            result["path"] = self.__path
+            result = self.__extractor.extract(on_partial=self.__on_partial).dict()
+        result.pop("partial", None)
+        result["path"] = self.__path
         return result
 
     def extract(self) -> BeatsStruct:
@@ -106,10 +114,86 @@ class Beats(CachableDb):
         self.fetch()
 
 
+class FetcherStats(BaseModel):
+    submitted: int = 0
+    completed: int = 0
+    cached: int = 0
+    cancelled: int = 0
+    failed: int = 0
+    last_time: float = 0
+    max_time: float = 0
+    total_time: float = 0
+
+    @property
+    def average_time(self) -> float:
+        return self.total_time / self.completed if self.completed else 0
+
+
+class BeatsJobQueue(object):
+    """Pending extraction paths ordered by priority, then by the order they
+    were added. A path raised with prioritize() gets a new heap entry and
+    the old one is skipped when it comes up; replace() drops everything
+    not yet handed out."""
+
+    CURRENT = 0
+    NEXT = 1
+    QUEUED = 2
+
+    def __init__(self) -> None:
+        self.__cond = Condition()
+        self.__heap: list[tuple[int, int, Optional[str]]] = []
+        self.__priority: dict[str, int] = {}
+        self.__seq = count()
+        self.cancelled = 0
+
+    def __len__(self) -> int:
+        with self.__cond:
+            return len(self.__priority)
+
+    def replace(self, paths: list[str]) -> int:
+        with self.__cond:
+            dropped = len(self.__priority)
+            self.cancelled += dropped
+            self.__heap = []
+            self.__priority = {}
+            for path in paths:
+                self.__push(path, self.QUEUED)
+            self.__cond.notify()
+            return dropped
+
+    def prioritize(self, path: str, priority: int):
+        with self.__cond:
+            if self.__priority.get(path, self.QUEUED + 1) <= priority:
+                return
+            self.__push(path, priority)
+            self.__cond.notify()
+
+    def get(self) -> Optional[str]:
+        with self.__cond:
+            while True:
+                while not self.__heap:
+                    self.__cond.wait()
+                priority, _, path = heapq.heappop(self.__heap)
+                if path is None:
+                    return None
+                if self.__priority.get(path) == priority:
+                    del self.__priority[path]
+                    return path
+
+    def close(self):
+        with self.__cond:
+            heapq.heappush(self.__heap, (-1, next(self.__seq), None))
+            self.__cond.notify()
+
+    def __push(self, path: str, priority: int):
+        self.__priority[path] = priority
+        heapq.heappush(self.__heap, (priority, next(self.__seq), path))
+
+
 class FetcherMeta(type):
 
     __instance: Optional["Fetcher"] = None
-    __queue: Optional[Queue] = None
+    __jobs: Optional[BeatsJobQueue] = None
     __manager_queue: Optional[Queue] = None
     __do_extract: bool = False
 
@@ -132,67 +216,136 @@ class FetcherMeta(type):
         return cls.__manager_queue
 
     @property
-    def queue(cls):
-        if not cls.__queue:
-            cls.__queue = Queue()
-        return cls.__queue
+    def jobs(cls) -> BeatsJobQueue:
+        if not cls.__jobs:
+            cls.__jobs = BeatsJobQueue()
+        return cls.__jobs
+
+    @property
+    def stats(cls) -> FetcherStats:
+        return cls().get_stats()
 
     def add(cls, paths: list[str]):
-        cls.queue.queue.clear()
-        for p in paths:
-            cls.queue.put_nowait(p)
+        if dropped := cls.jobs.replace(paths):
+            logging.debug(f"beats jobs cancelled: {dropped}")
+
+    def prioritize(cls, current: Optional[str], upcoming: Optional[str] = None):
+        if current:
+            cls.jobs.prioritize(current, BeatsJobQueue.CURRENT)
+        if upcoming:
+            cls.jobs.prioritize(upcoming, BeatsJobQueue.NEXT)
 
 
 class Fetcher(StoppableThread, metaclass=FetcherMeta):
+    """Hands beat extraction jobs to a process pool.
 
-    def __init__(self, *args, **kwargs):
+    Cached beats are answered from the db without a job. Only as many jobs
+    as there are workers are submitted at a time, so the playing and next
+    track can still jump ahead of the rest of the queue when they change.
+    Running jobs are not interrupted when the queue is replaced, their
+    result is still cached."""
+
+    WORKERS = 2
 
+    def __init__(self, *args, **kwargs):
+        self.__stats = FetcherStats()
+        self.__workers = app_config.get("beats", {}).get("workers", self.WORKERS)
+        self.__slots = Semaphore(self.__workers)
         super().__init__(*args, **kwargs)
 
-    def resolveBeats(
-        self,
-        extractor: BeatsExtractor,
-        allow_extract: Optional[bool] = None
-    ):
-        beats = Beats(
-            path=extractor.requested_path,
-            extractor=extractor,
-            allow_extract=allow_extract
-        )
-        return beats
+    def stop(self):
+        super().stop()
+        Fetcher.jobs.close()
+        self.__slots.release()
+
+    def get_stats(self) -> FetcherStats:
+        stats = self.__stats.copy()
+        stats.cancelled += Fetcher.jobs.cancelled
+        return stats
 
     def run(self):
+        workers = self.__workers
+        context = multiprocessing.get_context("spawn")
+        slots = self.__slots
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        manager = context.Manager()
+        updates = manager.Queue()
+        Thread(target=self.__forward, args=(updates,), daemon=True).start()
+        try:
+            while not self.stopped():
+                path = Fetcher.jobs.get()
+                if path is None:
+                    break
+                try:
+                    if self.__fromcache(path):
+                        continue
+                except Exception as e:
+                    logging.exception(e)
+                slots.acquire()
+                if self.stopped():
+                    break
+                future = pool.submit(
+                    extract_job,
+                    path,
+                    BeatsExtractor.store_root.as_posix(),
+                    Fetcher.do_extract,
+                    updates,
+                )
+                self.__stats.submitted += 1
+                future.add_done_callback(partial(self.__onDone, path, slots))
+        finally:
+            updates.put(None)
+            pool.shutdown(wait=False, cancel_futures=True)
+            manager.shutdown()
+
+    def __respond(self, struct: Optional[BeatsStruct]):
+        if struct and Fetcher.manager_queue:
+            Fetcher.manager_queue.put_nowait((Command.PLAYER_RESPONSE, struct))
+
+    def __forward(self, updates):
         while True:
             try:
-                audio_path = Fetcher.queue.get_nowait()
-                extractor = BeatsExtractor(path=audio_path)
-                assert Fetcher.manager_queue
-                beats = self.resolveBeats(extractor=extractor)
-                Fetcher.manager_queue.put_nowait(
-                    (
-                        Command.PLAYER_RESPONSE,
-                        BeatsStruct(
-                            tempo=float(beats.fast_bpm),
-                            beats=None,
-                            path=audio_path
-                        ),
-                    )
-                )
-                if app_config.get("beats", {}).get("extract", False):
-                    beats = self.resolveBeats(extractor=extractor)
-                    Fetcher.manager_queue.put_nowait(
-                        (
-                            Command.PLAYER_RESPONSE,
-                            beats.model,
-                        )
-                    )
-                Fetcher.queue.task_done()
-            except Empty:
-                pass
-            except AssertionError as e:
-                logging.exception(e)
-                Fetcher.queue.task_done()
-            except Exception:
-                Fetcher.queue.task_done()
-            finally:
-                sleep(0.1)
+                data = updates.get()
+            except (EOFError, OSError):
+                break
+            if data is None:
+                break
+            self.__respond(BeatsStruct(**data))
+
+    def __fromcache(self, path: str) -> bool:
+        beats = Beats(path=path.split("Music/")[-1], allow_extract=False)
+        if not beats.isCached:
+            return False
+        model = beats.fromcache()
+        if not model or (Fetcher.do_extract and not model.beats):
+            return False
+        self.__stats.cached += 1
+        self.__respond(
+            BeatsStruct(path=path, tempo=model.tempo, beats=model.beats or None)
+        )
+        return True
+
+    def __onDone(self, path: str, slots: Semaphore, future: Future):
+        slots.release()
+        try:
+            result, elapsed = future.result()
+        except CancelledError:
+            self.__stats.cancelled += 1
+            return
+        except Exception as e:
+            self.__stats.failed += 1
+            logging.debug(f"beats job {path} failed: {e}")
+            return
+        result.pop("partial", None)
+        result["path"] = path.split("Music/")[-1]
+        try:
+            Beats(path=result["path"], allow_extract=False).tocache({**result})
+        except Exception as e:
+            logging.exception(e)
+        stats = self.__stats
+        stats.completed += 1
+        stats.last_time = elapsed
+        stats.max_time = max(stats.max_time, elapsed)
+        stats.total_time += elapsed
+        logging.debug(f"beats job {path} done in {elapsed}s -> {self.get_stats()}")
+        self.__respond(BeatsStruct(**{**result, "path": path}))
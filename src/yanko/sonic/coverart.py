@@ -1,43 +1,109 @@
+from datetime import timezone
+from io import BytesIO
+import logging
+import time
+from pathlib import Path
+from threading import Lock
 from cachable.storage.filestorage.image import CachableFileImage
 from urllib.parse import parse_qs, urlparse
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
 from corestring import file_hash, string_hash
+from requests.exceptions import RequestException
 from typing import Optional
+from yanko.core.singleflight import SingleFlight
+from yanko.db.base import YankoDb
+from yanko.db.models import CoverArt
+from yanko.sonic.session import Session
 
 
 class CoverArtFile(CachableFileImage):
+    """Cover art in the file cache, indexed in the CoverArt table.
+
+    The index row holds size, mtime, whether the file is the server's
+    placeholder and the icon size, so checking the cache is a row lookup
+    and a stat, and the file is hashed once, when it is downloaded or first
+    seen. A file whose size or mtime no longer match its row is fetched
+    again.
+    Placeholders are served as they are until PLACEHOLDER_RETRY seconds
+    after the last attempt and then downloaded again."""
 
     _filename: Optional[str] = None
     _filehash: Optional[str] = None
+    _entry: Optional[CoverArt] = None
     ICON_SIZE = (22, 22)
+    PLACEHOLDER_RETRY = 21600
     NOT_CACHED_HASH = [
         "b9013a23400aeab42ea7dbcd89832ed41a94ab909c1a6d91f866ccd38123515e",
         "decfd6156ee93368160d76849f377ad65d540c80061a24b673b98ffbf805f026",
     ]
 
+    flights = SingleFlight()
+    __indexed = False
+    __index_lock = Lock()
+
     def __init__(self, url: str) -> None:
         self._url = url
         super().__init__()
 
+    @classmethod
+    def cover_id(cls, url: str) -> str:
+        pa = parse_qs(urlparse(url).query)
+        return "".join(pa.get("id", [])) or url
+
     @property
     def filename(self):
         if not self._filename:
-            pu = urlparse(self._url)
-            pa = parse_qs(pu.query)
-            id = "".join(pa.get("id", []))
-            if not id:
-                id = self._url
-            self._filename = f"{string_hash(id)}.webp"
+            self._filename = f"{string_hash(self.cover_id(self._url))}.webp"
         return self._filename
 
+    @classmethod
+    def index(cls):
+        with cls.__index_lock:
+            if not cls.__indexed:
+                YankoDb.db.create_tables([CoverArt], safe=True)
+                cls.__indexed = True
+
+    @property
+    def entry(self) -> Optional[CoverArt]:
+        if self._entry is None:
+            __class__.index()
+            self._entry = CoverArt.fetch(CoverArt.filename == self.filename)
+        return self._entry
+
     @property
     def isCached(self) -> bool:
         try:
             assert self._path
-            return self._path.exists() and self.filehash not in self.NOT_CACHED_HASH
-        except AssertionError:
+            stat = self._path.stat()
+            assert stat.st_size
+            entry = self.entry or self.__record()
+            assert entry.size == stat.st_size and entry.mtime == stat.st_mtime
+            return not entry.placeholder or not self.__isRetryDue(entry)
+        except (AssertionError, OSError):
             return False
 
+    def __isRetryDue(self, entry: CoverArt) -> bool:
+        updated = entry.updated.replace(tzinfo=timezone.utc).timestamp()  # type: ignore
+        return time.time() - updated > self.PLACEHOLDER_RETRY
+
+    def __record(self) -> CoverArt:
+        assert self._path
+        stat = self._path.stat()
+        CoverArt.insert(
+            filename=self.filename,
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            placeholder=self.filehash in self.NOT_CACHED_HASH,
+            updated=int(time.time()),
+        ).on_conflict_replace().execute()
+        self._entry = CoverArt.fetch(CoverArt.filename == self.filename)
+        assert self._entry
+        return self._entry
+
+    @property
+    def cached_path(self) -> Optional[Path]:
+        return self._path if self.isCached else None
+
     @property
     def filehash(self):
         if not self._filehash:
@@ -49,14 +115,51 @@ class CoverArtFile(CachableFileImage):
     def url(self):
         return self._url
 
+    def _init(self):
+        if self.isCached:
+            return
+        with __class__.flights.hold(self.filename):
+            self._entry = None
+            if self.isCached:
+                return
+            if not self.__download():
+                super()._init()
+            self._filehash = None
+            try:
+                self.__record()
+            except (AssertionError, OSError) as e:
+                logging.debug(f"cover art not cached {self._url}: {e}")
+
+    def __download(self) -> bool:
+        try:
+            assert self._path
+            assert self._url and self._url.startswith("http")
+            resp = Session.get(self._url)
+            resp.raise_for_status()
+            im = Image.open(BytesIO(resp.content))
+            im.save(self._path.as_posix(), format="webp")
+            return True
+        except AssertionError:
+            return False
+        except (RequestException, UnidentifiedImageError, OSError) as e:
+            logging.debug(f"cover art download failed {self._url}: {e}")
+            return False
+
     @property
     def icon_path(self):
         self._init()
         assert self._path
         stem = self._path.stem
         icon_path = self._path.with_stem(f"{stem}_icon")
-        if not icon_path.exists() or file_hash(icon_path) in self.NOT_CACHED_HASH:
-            im = Image.open(self._path.as_posix())
-            im.thumbnail(self.ICON_SIZE, Image.BICUBIC)
-            im.save(icon_path.as_posix())
+        entry = self.entry
+        if entry and entry.icon_width and icon_path.exists():
+            return icon_path
+        im = Image.open(self._path.as_posix())
+        im.thumbnail(self.ICON_SIZE, Image.BICUBIC)
+        im.save(icon_path.as_posix())
+        if entry:
+            entry.icon_width, entry.icon_height = im.size
+            CoverArt.update(
+                icon_width=entry.icon_width, icon_height=entry.icon_height
+            ).where(CoverArt.id == entry.id).execute()
         return icon_path
@@ -0,0 +1,200 @@
+import logging
+from enum import Enum
+from queue import Queue
+from typing import Iterator, Optional, TYPE_CHECKING
+from pydantic import BaseModel
+from yanko.core.thread import StoppableThread
+from yanko.sonic import Command, LastAdded, MostPlayed
+
+if TYPE_CHECKING:
+    from .api import Client
+
+
+class DriverState(Enum):
+    IDLE = "idle"
+    LOADING = "loading"
+    PLAYING = "playing"
+    EXHAUSTED = "exhausted"
+
+
+class ProgramMode(Enum):
+    RANDOM = "random"
+    RANDOM_ALBUM = "random_album"
+    RADIO = "radio"
+    ARTIST = "artist"
+    ALBUM = "album"
+    LAST_ADDED = "last_added"
+    MOST_PLAYED = "most_played"
+
+
+class Program(BaseModel):
+    mode: ProgramMode
+    target: Optional[str] = None
+    albums: list[str] = []
+
+
+class PlaybackDriver(StoppableThread):
+    """Plays whatever the current program puts in the PlayQueue.
+
+    IDLE waits for a playback command and turns it into a program, LOADING
+    fills the PlayQueue for it, PLAYING plays one track per step and
+    EXHAUSTED decides what follows the last track - the same queue again
+    when a skip is pending, the next album or a refill for endless modes.
+    A stopped or failed track drops back to IDLE."""
+
+    def __init__(self, client: "Client", *args, **kwargs):
+        self.client = client
+        self.queue: Queue = Queue()
+        self.state = DriverState.IDLE
+        self.__program: Optional[Program] = None
+        self.__tracks: Optional[Iterator[dict]] = None
+        self.__last_track: Optional[dict] = None
+        self.__played = 0
+        super().__init__(*args, **kwargs)
+
+    def stop(self):
+        super().stop()
+        self.queue.put_nowait((None, None))
+
+    def run(self):
+        while not self.stopped():
+            match (self.state):
+                case DriverState.IDLE:
+                    state = self.__idle()
+                case DriverState.LOADING:
+                    state = self.__load()
+                case DriverState.PLAYING:
+                    state = self.__play()
+                case DriverState.EXHAUSTED:
+                    state = self.__advance()
+            if state != self.state:
+                logging.debug(f"driver {self.state.value} -> {state.value}")
+            self.state = state
+
+    def __start(self, program: Program) -> DriverState:
+        self.__program = program
+        return DriverState.LOADING
+
+    def __rewind(self) -> DriverState:
+        self.__tracks = iter(self.client.playqueue)
+        self.__played = 0
+        return DriverState.PLAYING
+
+    def __idle(self) -> DriverState:
+        cmd, payload = self.queue.get()
+        self.queue.task_done()
+        match (cmd):
+            case Command.RANDOM:
+                self.client.playqueue.skip_to = None
+                return self.__start(Program(mode=ProgramMode.RANDOM))
+            case Command.PLAYLIST:
+                if not self.__program:
+                    self.__program = Program(mode=ProgramMode.RANDOM)
+                return self.__rewind()
+            case Command.RANDOM_ALBUM:
+                self.client.playqueue.skip_to = None
+                return self.__start(Program(mode=ProgramMode.RANDOM_ALBUM))
+            case Command.ALBUM:
+                return self.__start(
+                    Program(mode=ProgramMode.ALBUM, target=payload)
+                )
+            case Command.ARTIST:
+                return self.__start(
+                    Program(mode=ProgramMode.ARTIST, target=payload)
+                )
+            case Command.PLAY_LAST_ADDED:
+                return self.__start(Program(mode=ProgramMode.LAST_ADDED))
+            case Command.PLAY_MOST_PLAYED:
+                return self.__start(Program(mode=ProgramMode.MOST_PLAYED))
+            case Command.SONG:
+                self.client.playqueue.skip_to = payload
+        return DriverState.IDLE
+
+    def __load(self) -> DriverState:
+        try:
+            assert self.__program
+            songs = self.__fetch(self.__program)
+        except AssertionError:
+            return DriverState.IDLE
+        except Exception as e:
+            logging.exception(e)
+            return DriverState.IDLE
+        if not songs:
+            logging.warning(f"nothing to play for {self.__program}")
+            return DriverState.IDLE
+        self.client.playqueue.load(songs)
+        return self.__rewind()
+
+    def __fetch(self, program: Program) -> Optional[list[dict]]:
+        client = self.client
+        match (program.mode):
+            case ProgramMode.RANDOM:
+                return client.get_random_songs()
+            case ProgramMode.RADIO:
+                return client.get_similar_songs(program.target)
+            case ProgramMode.ARTIST:
+                return client.get_top_songs(program.target)
+            case ProgramMode.ALBUM:
+                return client.get_album_tracks(program.target)
+            case ProgramMode.RANDOM_ALBUM:
+                album_id = client.get_random_album_id()
+                assert album_id
+                self.__program = Program(mode=ProgramMode.ALBUM, target=album_id)
+                return self.__fetch(self.__program)
+            case ProgramMode.LAST_ADDED:
+                albums = client.get_last_added()
+                client.manager_queue.put_nowait(
+                    (Command.PLAYER_RESPONSE, LastAdded(albums=albums))
+                )
+                self.__program = self.__album_sequence([a.id for a in albums])
+                return self.__fetch(self.__program)
+            case ProgramMode.MOST_PLAYED:
+                albums = client.get_most_played()
+                client.manager_queue.put_nowait(
+                    (Command.PLAYER_RESPONSE, MostPlayed(albums=albums))
+                )
+                self.__program = self.__album_sequence([a.id for a in albums])
+                return self.__fetch(self.__program)
+        return None
+
+    def __album_sequence(self, album_ids: list[str]) -> Program:
+        assert album_ids
+        return Program(
+            mode=ProgramMode.ALBUM,
+            target=album_ids[0],
+            albums=album_ids[1:]
+        )
+
+    def __play(self) -> DriverState:
+        assert self.__tracks
+        track = next(self.__tracks, None)
+        if not track:
+            return DriverState.EXHAUSTED
+        self.__last_track = track
+        self.__played += 1
+        if not self.client.play_stream(dict(track)):
+            return DriverState.IDLE
+        return DriverState.PLAYING
+
+    def __advance(self) -> DriverState:
+        playqueue = self.client.playqueue
+        if playqueue.skip_to:
+            if self.__played:
+                return self.__rewind()
+            logging.debug(f"{playqueue.skip_to} not in the play queue")
+            playqueue.skip_to = None
+        program = self.__program
+        if not program:
+            return DriverState.IDLE
+        if program.mode == ProgramMode.ALBUM:
+            if program.albums:
+                self.__program = self.__album_sequence(program.albums)
+                return DriverState.LOADING
+            try:
+                assert self.__last_track
+                artist_id = self.__last_track.get("artistId")
+                assert artist_id
+                self.__program = Program(mode=ProgramMode.RADIO, target=artist_id)
+            except AssertionError:
+                return DriverState.IDLE
+        return DriverState.LOADING
@@ -0,0 +1,188 @@
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from typing import Callable, Optional
+from peewee import fn
+from pydantic import BaseModel
+from yanko.core import perftime
+from yanko.core.config import app_config
+from yanko.db.base import YankoDb
+from yanko.db.models import SearchIndex
+from yanko.sonic import Search3Response
+
+PageLoader = Callable[[str, int, int], Optional[dict]]
+
+
+class LibraryStats(BaseModel):
+    artists: int = 0
+    albums: int = 0
+    songs: int = 0
+    added: int = 0
+    removed: int = 0
+    refreshes: int = 0
+
+
+class LibraryIndex(object):
+    """Full-text index of the library in an FTS5 table.
+
+    refresh() pages through search3 with an empty query for every artist,
+    album and song and writes only the rows that changed since the last
+    refresh, one refresh at a time on its own thread. search() matches each
+    word of the query as a prefix, all words first and any word when that
+    finds nothing, and returns None while the index is empty or FTS5 is not
+    available, so the caller can ask the server instead."""
+
+    KINDS = ["artist", "album", "song"]
+    PAGE_SIZE = 500
+    LIMIT = 20
+
+    def __init__(self, loader: PageLoader) -> None:
+        config = app_config.get("library", {})
+        self.__loader = loader
+        self.__page_size = config.get("page_size", self.PAGE_SIZE)
+        self.__limit = config.get("limit", self.LIMIT)
+        self.__stats = LibraryStats()
+        self.__refreshing = Event()
+        self.__executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="library"
+        )
+        self.__enabled = SearchIndex.fts5_installed()
+        if not self.__enabled:
+            logging.warning("sqlite has no fts5, searching on the server")
+            return
+        YankoDb.db.create_tables([SearchIndex], safe=True)
+        self.__count()
+
+    @property
+    def ready(self) -> bool:
+        return self.__enabled and any(
+            [self.__stats.artists, self.__stats.albums, self.__stats.songs]
+        )
+
+    def get_stats(self) -> LibraryStats:
+        return self.__stats.copy()
+
+    def refresh(self):
+        if not self.__enabled or self.__refreshing.is_set():
+            return
+        self.__refreshing.set()
+        self.__executor.submit(self.__refresh)
+
+    def search(self, query: str) -> Optional[Search3Response]:
+        if not self.ready:
+            return None
+        words = re.findall(r"\w+", query)
+        if not words:
+            return Search3Response()
+        terms = [f'"{w}"*' for w in words]
+        result = self.__match(" AND ".join(terms))
+        if not any(result.values()) and len(terms) > 1:
+            result = self.__match(" OR ".join(terms))
+        return Search3Response(**result)
+
+    def __match(self, expression: str) -> dict[str, list[dict]]:
+        return {
+            kind: [
+                json.loads(row.data)
+                for row in SearchIndex.select(SearchIndex.data)
+                .where(SearchIndex.match(expression) & (SearchIndex.kind == kind))
+                .order_by(SearchIndex.bm25(0, 0, 10.0, 2.0, 1.0, 0))
+                .limit(self.__limit)
+            ]
+            for kind in self.KINDS
+        }
+
+    def __refresh(self):
+        try:
+            with perftime("library index refresh"):
+                for kind in self.KINDS:
+                    self.__sync(kind, self.__fetch(kind))
+                self.__stats.refreshes += 1
+                self.__count()
+            logging.debug(f"library index -> {self.__stats}")
+        except Exception as e:
+            logging.exception(e)
+        finally:
+            self.__refreshing.clear()
+
+    def __fetch(self, kind: str) -> Optional[dict[str, dict]]:
+        items: dict[str, dict] = {}
+        offset = 0
+        while True:
+            page = self.__loader(kind, self.__page_size, offset)
+            if page is None:
+                return None
+            entries = page.get(kind, [])
+            for entry in entries:
+                items[entry.get("id")] = entry
+            if len(entries) < self.__page_size:
+                return items
+            offset += self.__page_size
+
+    def __sync(self, kind: str, items: Optional[dict[str, dict]]):
+        if items is None:
+            logging.warning(f"library index: fetching {kind} failed")
+            return
+        current = {
+            row.item_id: (row.rowid, row.data)
+            for row in SearchIndex.select(
+                SearchIndex.rowid, SearchIndex.item_id, SearchIndex.data
+            ).where(SearchIndex.kind == kind)
+        }
+        rows = {
+            item_id: json.dumps(data, sort_keys=True)
+            for item_id, data in items.items()
+        }
+        removed = [
+            rowid
+            for item_id, (rowid, data) in current.items()
+            if rows.get(item_id) != data
+        ]
+        added = [
+            dict(
+                kind=kind,
+                item_id=item_id,
+                data=data,
+                **self.__columns(kind, items[item_id])
+            )
+            for item_id, data in rows.items()
+            if item_id not in current or current[item_id][1] != data
+        ]
+        with YankoDb.db.atomic():
+            for idx in range(0, len(removed), self.__page_size):
+                SearchIndex.delete().where(
+                    SearchIndex.rowid.in_(removed[idx:idx + self.__page_size])
+                ).execute()
+            for idx in range(0, len(added), self.__page_size):
+                SearchIndex.insert_many(added[idx:idx + self.__page_size]).execute()
+        self.__stats.removed += len(removed)
+        self.__stats.added += len(added)
+
+    def __columns(self, kind: str, data: dict) -> dict[str, str]:
+        match (kind):
+            case "artist":
+                return dict(name=data.get("name", ""), artist="", album="")
+            case "album":
+                return dict(
+                    name=data.get("name") or data.get("title", ""),
+                    artist=data.get("artist", ""),
+                    album="",
+                )
+            case _:
+                return dict(
+                    name=data.get("title", ""),
+                    artist=data.get("artist", ""),
+                    album=data.get("album", ""),
+                )
+
+    def __count(self):
+        counts = dict(
+            SearchIndex.select(SearchIndex.kind, fn.COUNT(SearchIndex.rowid))
+            .group_by(SearchIndex.kind)
+            .tuples()
+        )
+        self.__stats.artists = counts.get("artist", 0)
+        self.__stats.albums = counts.get("album", 0)
+        self.__stats.songs = counts.get("song", 0)
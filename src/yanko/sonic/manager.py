@@ -1,7 +1,10 @@
+from concurrent.futures import Future
+from functools import partial
 from pathlib import Path
 from queue import Queue
+from threading import Lock
 from typing import Optional
-from yanko.core import perftime
+from yanko.core.trace import LatencyTrace
 from yanko.core.thread import StoppableThread
 from yanko.player.bpm import BeatsStruct
 from yanko.sonic import (
@@ -14,7 +17,10 @@ from yanko.sonic import (
     Playstatus,
     LastAdded,
     Search,
+    SearchDone,
+    SearchIcon,
     Share,
+    SongInfo,
     Status,
     RecentlyPlayed,
     ArtistInfo as ArtistInfoData
@@ -23,7 +29,8 @@ from yanko.sonic.announce import Announce
 from yanko.sonic.api import Client
 from yanko.sonic.coverart import CoverArtFile
 from yanko.sonic.artist import ArtistInfo
-from multiprocessing.pool import ThreadPool
+from yanko.sonic.resolver import Resolver
+from yanko.resources import default_cover
 import logging
 
 # def resolveAlbumYear(obj):
@@ -42,89 +49,98 @@ import logging
 #     return obj
 
 
-def resolveCoverArt(obj):
+def coverArtPaths(url: str) -> Optional[tuple[Optional[str], Optional[str]]]:
     try:
-        ca = CoverArtFile(obj.coverArt)
+        ca = CoverArtFile(url)
         assert ca.path
         res = ca.path
-        obj.coverArt = res.as_posix() if res.exists() else None
         icon = ca.icon_path
-        if icon:
-            obj.coverArtIcon = icon.as_posix()
-        else:
-            obj.coverArtIcon = None
+        return (
+            res.as_posix() if res.exists() else None,
+            icon.as_posix() if icon else None,
+        )
     except AssertionError:
-        logging.error(f"failed to resolve icon cover art {obj}")
-    return obj
+        logging.error(f"failed to resolve icon cover art {url}")
+        return None
 
 
-def resolveArtistImage(obj: ArtistInfoData):
+def imagePath(url: str) -> Optional[str]:
     try:
-        assert obj.largeImageUrl
-        ca = CoverArtFile(obj.largeImageUrl)
+        ca = CoverArtFile(url)
         assert ca.path
         res: Path = ca.path
-        obj.image = res.as_posix() if res.exists() else None
+        return res.as_posix() if res.exists() else None
     except AssertionError:
-        logging.error(f"failed to resolve cover art {obj}")
-    return obj
+        logging.error(f"failed to resolve cover art {url}")
+        return None
 
 
-def resolveIcon(obj):
-    if isinstance(obj, ArtistSearchItem):
-        try:
-            assert obj.icon
-            url = obj.icon.path
-            ai = ArtistInfo(url)
-            info = ai.info
-            if info:
-                assert info.largeImageUrl
-                obj.icon.path = info.largeImageUrl
-        except AssertionError as e:
-            logging.error(e)
+def artistImagePath(url: str) -> Optional[str]:
     try:
-        assert obj.icon
-        assert obj.icon.path
-        ca = CoverArtFile(obj.icon.path)
-        res = ca.path
-        assert res
-        obj.icon.path = res.as_posix() if res.exists() else None
+        info = ArtistInfo(url).info
+        assert info
+        assert info.largeImageUrl
+        return imagePath(info.largeImageUrl)
     except AssertionError as e:
         logging.error(e)
+        return None
+
+
+def applyCoverArt(obj, paths):
+    if paths:
+        obj.coverArt, obj.coverArtIcon = paths
     return obj
 
 
-def find_idx_by_id(items, item, k="id"):
-    for idx, itm in enumerate(items):
-        if getattr(itm, k) == getattr(item, k):
-            return idx
+def resolveCoverArt(obj):
+    return applyCoverArt(
+        obj,
+        Resolver.submit(
+            coverArtPaths, obj.coverArt, CoverArtFile.cover_id(obj.coverArt)
+        ).result()
+    )
 
 
-def resolveSearch(items):
-    with ThreadPool(10) as pool:
-        jobs = pool.map(resolveIcon, items)
-        for res in jobs:
-            try:
-                items[find_idx_by_id(items, res, "uid")] = res
-            except Exception as e:
-                logging.error(e, exc_info=True)
-        pool.close()
-        pool.join()
-    return items
+def resolveArtistImage(obj: ArtistInfoData):
+    try:
+        assert obj.largeImageUrl
+        obj.image = Resolver.submit(imagePath, obj.largeImageUrl).result()
+    except AssertionError:
+        logging.error(f"failed to resolve cover art {obj}")
+    return obj
+
+
+def previewIcon(obj) -> bool:
+    """Points the icon at the cached image, or at the default cover while
+    it is not cached yet, and tells which one it is."""
+    try:
+        assert obj.icon
+        assert obj.icon.path
+        url = obj.icon.path
+        if isinstance(obj, ArtistSearchItem):
+            info = ArtistInfo(url).cached_info
+            assert info
+            assert info.largeImageUrl
+            url = info.largeImageUrl
+        res = CoverArtFile(url).cached_path
+        assert res
+        obj.icon.path = res.as_posix()
+        return True
+    except AssertionError:
+        if obj.icon:
+            obj.icon.path = default_cover.as_posix()
+        return False
 
 
 def resolveAlbums(albums):
-    with perftime("resolve albums"):
-        with ThreadPool(10) as pool:
-            jobs = pool.map(resolveCoverArt, albums)
-            for res in jobs:
-                try:
-                    albums[find_idx_by_id(albums, res)] = res
-                except Exception as e:
-                    logging.error(e, exc_info=True)
-            pool.close()
-            pool.join()
-        return albums
+    urls = [album.coverArt for album in albums]
+    paths = Resolver.map(
+        coverArtPaths,
+        urls,
+        "resolve albums",
+        [CoverArtFile.cover_id(url) if url else None for url in urls],
+    )
+    return [applyCoverArt(album, res) for album, res in zip(albums, paths)]
 
 
 class ManagerMeta(type):
@@ -139,6 +155,20 @@ class ManagerMeta(type):
 
 class Manager(StoppableThread, metaclass=ManagerMeta):
     VOLUME_STEP = 0.05
+    PLAYBACK_COMMANDS = [
+        Command.NEXT,
+        Command.PREVIOUS,
+        Command.SONG,
+        Command.ALBUM,
+        Command.ALBUMSONG,
+        Command.ARTIST,
+        Command.RANDOM,
+        Command.RANDOM_ALBUM,
+        Command.CURRENT_ALBUM,
+        Command.CURRENT_ARTIST,
+        Command.PLAY_LAST_ADDED,
+        Command.PLAY_MOST_PLAYED,
+    ]
     alfred: Optional[Queue] = None
     playing_now: Optional[NowPlaying] = None
 
@@ -154,6 +184,8 @@ class Manager(StoppableThread, metaclass=ManagerMeta):
     def run(self):
         while not self.stopped():
             cmd, payload = self.commander.get()
+            if cmd in self.PLAYBACK_COMMANDS:
+                LatencyTrace.begin("playback", cmd.value)
             match (cmd):
                 case Command.TOGGLE:
                     self.__toggle()
@@ -211,6 +243,8 @@ class Manager(StoppableThread, metaclass=ManagerMeta):
                     self.player_processor(payload)
                 case Command.SHARE:
                     self.__share(payload)
+                case Command.SEEK:
+                    self.__seek(payload)
 
             self.commander.task_done()
 
@@ -222,14 +256,17 @@ class Manager(StoppableThread, metaclass=ManagerMeta):
             cmd.track = resolveCoverArt(cmd.track)
             Announce.announce(cmd.track)
             self.playing_now = cmd
-        elif isinstance(cmd, Search) and len(cmd.items):
-            cmd.items = resolveSearch(cmd.items)
+        elif isinstance(cmd, Search):
+            self.__searchIcons(cmd)
         elif isinstance(cmd, LastAdded):
             cmd.albums = resolveAlbums(cmd.albums)
         elif isinstance(cmd, RecentlyPlayed):
             cmd.albums = resolveAlbums(cmd.albums)
         elif isinstance(cmd, MostPlayed):
             cmd.albums = resolveAlbums(cmd.albums)
+        elif isinstance(cmd, SongInfo):
+            if self.playing_now and self.playing_now.track.id == cmd.song.id:
+                self.playing_now.song = cmd.song
         elif isinstance(cmd, BeatsStruct):
             pass
         elif isinstance(cmd, Share):
@@ -243,6 +280,50 @@ class Manager(StoppableThread, metaclass=ManagerMeta):
                 pass
         self.__ui_queue.put_nowait(cmd)
 
+    def __searchIcons(self, search: Search):
+        """Answers with the icons that are already cached and resolves the
+        rest in the background, each as a SearchIcon once it is ready and a
+        SearchDone after the last one."""
+        missing = []
+        for item in search.items:
+            if not item.icon or not item.icon.path:
+                continue
+            url = item.icon.path
+            if not previewIcon(item):
+                fn = artistImagePath if isinstance(item, ArtistSearchItem) else imagePath
+                missing.append((item.uid, fn, url))
+        if not missing:
+            self.__respond(SearchDone(queue_id=search.queue_id))
+            return
+        pending = [len(missing)]
+        lock = Lock()
+
+        def on_resolved(uid: str, future: Future):
+            try:
+                self.__respond(
+                    SearchIcon(
+                        queue_id=search.queue_id,
+                        uid=uid,
+                        path=future.result() or default_cover.as_posix()
+                    )
+                )
+            except Exception as e:
+                logging.error(e, exc_info=True)
+            finally:
+                with lock:
+                    pending[0] -= 1
+                    last = not pending[0]
+                if last:
+                    self.__respond(SearchDone(queue_id=search.queue_id))
+
+        for uid, fn, url in missing:
+            Resolver.submit(fn, url, CoverArtFile.cover_id(url)).add_done_callback(
+                partial(on_resolved, uid)
+            )
+
+    def __respond(self, response):
+        self.commander.put_nowait((Command.PLAYER_RESPONSE, response))
+
     def __random(self):
         if self.api.isPlaying:
             self.api.playback_queue.put_nowait((Action.STOP, None))
@@ -390,3 +471,10 @@ class Manager(StoppableThread, metaclass=ManagerMeta):
 
     def __restart(self):
         self.api.playback_queue.put_nowait((Action.RESTART, None))
+
+    def __seek(self, position):
+        try:
+            assert self.api.isPlaying
+            self.api.playback_queue.put_nowait((Action.SEEK, float(position)))
+        except (AssertionError, TypeError, ValueError) as e:
+            logging.debug(e)
@@ -0,0 +1,163 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+from threading import Lock
+from typing import Callable, Optional
+from peewee import DatabaseError, Field
+from yanko.core.config import app_config
+from yanko.db.base import YankoDb
+from yanko.db.models import Album, AlbumList, Artist, ModelBase, Song
+
+Loader = Callable[[], Optional[dict]]
+Listener = Callable[[dict], None]
+
+
+class MetadataStore(object):
+
+    MAX_AGE = {
+        "artist": 86400,
+        "album": 86400,
+        "song": 86400,
+        "albumList": 600,
+    }
+
+    MODELS: dict[str, type[ModelBase]] = {
+        "artist": Artist,
+        "album": Album,
+        "song": Song,
+        "albumList": AlbumList,
+    }
+
+    def __init__(self) -> None:
+        config = app_config.get("metadata", {})
+        self.__max_age = {**self.MAX_AGE, **config.get("max_age", {})}
+        self.__executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="metadata"
+        )
+        self.__pending: set[tuple[str, str]] = set()
+        self.__lock = Lock()
+        self.__migrate()
+        YankoDb.db.create_tables(list(self.MODELS.values()), safe=True)
+
+    def artist(self, artist_id: str, loader: Loader) -> Optional[dict]:
+        return self.__serve(Artist, Artist.artist_id, artist_id, "artist", loader)
+
+    def album(self, album_id: str, loader: Loader) -> Optional[dict]:
+        return self.__serve(Album, Album.album_id, album_id, "album", loader)
+
+    def song(self, song_id: str, loader: Loader) -> Optional[dict]:
+        return self.__serve(Song, Song.song_id, song_id, "song", loader)
+
+    def album_list(
+        self,
+        list_type: str,
+        loader: Loader,
+        on_update: Optional[Listener] = None
+    ) -> Optional[dict]:
+        return self.__serve(
+            AlbumList,
+            AlbumList.list_type,
+            list_type,
+            "albumList",
+            loader,
+            on_update
+        )
+
+    def invalidate(self, *kinds: str):
+        models = [
+            model
+            for kind, model in self.MODELS.items()
+            if not kinds or kind in kinds
+        ]
+        with YankoDb.db.atomic():
+            for model in models:
+                model.update(updated=0).execute()
+        logging.debug(f"metadata store invalidated {kinds}")
+
+    def __migrate(self):
+        # the artist and album tables of the old models were never written
+        # to and lack the store's columns, they are dropped and recreated
+        db = YankoDb.db
+        outdated = [
+            model
+            for model in self.MODELS.values()
+            if db.table_exists(model._meta.table_name)
+            and not set(model._meta.columns).issubset(
+                c.name for c in db.get_columns(model._meta.table_name)
+            )
+        ]
+        if outdated:
+            logging.warning(f"metadata store: recreating {[m.__name__ for m in outdated]}")
+            db.drop_tables(outdated)
+
+    def __serve(
+        self,
+        model: type[ModelBase],
+        field: Field,
+        key: str,
+        kind: str,
+        loader: Loader,
+        on_update: Optional[Listener] = None
+    ) -> Optional[dict]:
+        try:
+            if row := model.fetch(field == key):
+                if self.__isStale(row, kind):
+                    self.__revalidate(model, field, key, loader, row.data, on_update)
+                return row.data
+        except DatabaseError as e:
+            logging.exception(e)
+            return loader()
+        data = loader()
+        if data:
+            try:
+                self.__write(model, field, key, data)
+            except DatabaseError as e:
+                logging.exception(e)
+        return data
+
+    def __isStale(self, row: ModelBase, kind: str) -> bool:
+        updated = row.updated.replace(tzinfo=timezone.utc).timestamp()  # type: ignore
+        return time.time() - updated > self.__max_age.get(kind, 0)
+
+    def __revalidate(
+        self,
+        model: type[ModelBase],
+        field: Field,
+        key: str,
+        loader: Loader,
+        current: dict,
+        on_update: Optional[Listener] = None
+    ):
+        with self.__lock:
+            if (model.__name__, key) in self.__pending:
+                return
+            self.__pending.add((model.__name__, key))
+
+        def job():
+            try:
+                data = loader()
+                if not data:
+                    return
+                self.__write(model, field, key, data)
+                if on_update and data != current:
+                    on_update(data)
+            except Exception as e:
+                logging.exception(e)
+            finally:
+                with self.__lock:
+                    self.__pending.discard((model.__name__, key))
+
+        self.__executor.submit(job)
+
+    def __write(self, model: type[ModelBase], field: Field, key: str, data: dict):
+        now = int(time.time())
+        with YankoDb.db.atomic():
+            model.insert(
+                **{**model.from_response(data), field.name: key, "updated": now}  # type: ignore
+            ).on_conflict_replace().execute()
+            if model is Album:
+                for song in data.get("song", []):
+                    Song.insert(
+                        **{**Song.from_response(song), "updated": now}
+                    ).on_conflict_replace().execute()
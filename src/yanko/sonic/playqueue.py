@@ -6,6 +6,7 @@ import pickle
 from yanko.sonic import Command, Playlist, Track
 from datetime import datetime, timezone
 from yanko.sonic.beats import Fetcher
+from yanko.player.precache import Precache
 import logging
 from typing import Optional
 
@@ -16,12 +17,25 @@ class PlayQueue:
     __idx: int = 0
     __last_id: Optional[str] = None
     __skip_error: int = 0
-    skip_to = None
+    __skip_to: Optional[str] = None
 
     def __init__(self, manager_queue: Queue) -> None:
         self.__queue = manager_queue
         self.__load()
 
+    @property
+    def skip_to(self) -> Optional[str]:
+        return self.__skip_to
+
+    @skip_to.setter
+    def skip_to(self, val: Optional[str]):
+        self.__skip_to = val
+        if not val:
+            return
+        ids = [s.get("id") for s in self.__songs]
+        if val in ids:
+            Precache.schedule(self.__songs[ids.index(val) + 1:])
+
     @property
     def playlist_file(self) -> Path:
         return app_config.app_dir / "playlist.dat"
@@ -92,8 +106,19 @@ class PlayQueue:
                     self.skip_to = None
                 else:
                     continue
+            Precache.schedule(self.__songs[idx + 1:])
             yield song
 
+    @property
+    def upcoming(self) -> Optional[dict]:
+        if self.skip_to:
+            return next(
+                filter(lambda x: x.get("id") == self.skip_to, self.__songs), None
+            )
+        if self.__idx + 1 < len(self.__songs):
+            return self.__songs[self.__idx + 1]
+        return None
+
     def previous(self):
         res = self.__songs[max(0, self.__idx - 1)]
         self.skip_to = res.get("id")
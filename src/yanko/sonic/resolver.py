@@ -0,0 +1,163 @@
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+from time import perf_counter
+from typing import Any, Callable, Hashable, Optional
+from pydantic import BaseModel
+from yanko.core.config import app_config
+
+
+class ResolverStats(BaseModel):
+    batches: int = 0
+    items: int = 0
+    jobs: int = 0
+    coalesced: int = 0
+    hits: int = 0
+    failed: int = 0
+    last: float = 0
+    worst: float = 0
+    total: float = 0
+
+    @property
+    def average(self) -> float:
+        return self.total / self.batches if self.batches else 0
+
+
+class ResolverMeta(type):
+
+    __instance: Optional["Resolver"] = None
+
+    def __call__(cls, *args: Any, **kwds: Any) -> Any:
+        if not cls.__instance:
+            cls.__instance = type.__call__(cls, *args, **kwds)
+        return cls.__instance
+
+    def submit(
+        cls,
+        fn: Callable[[Any], Any],
+        arg: Any,
+        key: Optional[Hashable] = None
+    ) -> Future:
+        return cls().get_future(fn, arg, key)
+
+    def map(
+        cls,
+        fn: Callable[[Any], Any],
+        args: list[Any],
+        label: str = "resolve",
+        keys: Optional[list[Hashable]] = None
+    ) -> list[Any]:
+        return cls().get_results(fn, args, label, keys)
+
+    def forget(cls):
+        cls().clear()
+
+    @property
+    def stats(cls) -> ResolverStats:
+        return cls().get_stats()
+
+
+class Resolver(object, metaclass=ResolverMeta):
+    """Shared pool for cover art, artist image and icon lookups.
+
+    A job is fn(arg) under a key, the cover or artist id, and defaults to
+    the arg itself. There is one job per (fn, key) while it is in flight,
+    so the same cover asked for twice in a batch or by two batches at once
+    waits on the same future, and the last RESOLVED results are kept in
+    memory so asking again skips the cache file checks. map() returns the
+    results in the order of the args."""
+
+    WORKERS = 10
+    RESOLVED = 1024
+
+    def __init__(self) -> None:
+        workers = app_config.get("resolver", {}).get("workers", self.WORKERS)
+        self.__executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="resolver"
+        )
+        self.__inflight: dict[tuple[Callable, Hashable], Future] = {}
+        self.__resolved: OrderedDict[tuple[Callable, Hashable], Any] = OrderedDict()
+        self.__lock = Lock()
+        self.__stats = ResolverStats()
+
+    def get_stats(self) -> ResolverStats:
+        with self.__lock:
+            return self.__stats.copy()
+
+    def clear(self):
+        with self.__lock:
+            self.__resolved.clear()
+
+    def get_future(
+        self,
+        fn: Callable[[Any], Any],
+        arg: Any,
+        key: Optional[Hashable] = None
+    ) -> Future:
+        job = (fn, arg if key is None else key)
+        with self.__lock:
+            if job in self.__resolved:
+                self.__resolved.move_to_end(job)
+                self.__stats.hits += 1
+                future: Future = Future()
+                future.set_result(self.__resolved[job])
+                return future
+            if future := self.__inflight.get(job):
+                self.__stats.coalesced += 1
+                return future
+            future = self.__executor.submit(fn, arg)
+            self.__inflight[job] = future
+            self.__stats.jobs += 1
+        future.add_done_callback(partial(self.__done, job))
+        return future
+
+    def get_results(
+        self,
+        fn: Callable[[Any], Any],
+        args: list[Any],
+        label: str,
+        keys: Optional[list[Hashable]] = None
+    ) -> list[Any]:
+        started = perf_counter()
+        futures = [
+            self.get_future(fn, arg, key)
+            for arg, key in zip(args, keys or [None] * len(args))
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logging.error(e, exc_info=True)
+                with self.__lock:
+                    self.__stats.failed += 1
+                results.append(None)
+        elapsed = perf_counter() - started
+        with self.__lock:
+            self.__stats.batches += 1
+            self.__stats.items += len(args)
+            self.__stats.last = elapsed
+            self.__stats.worst = max(self.__stats.worst, elapsed)
+            self.__stats.total += elapsed
+        logging.debug(f"{label}: {len(args)} items in {elapsed:.3f}s")
+        return results
+
+    def __done(self, job: tuple[Callable, Hashable], future: Future):
+        with self.__lock:
+            if self.__inflight.get(job) is future:
+                del self.__inflight[job]
+            if future.cancelled() or future.exception() is not None:
+                return
+            if not self.__isResolved(future.result()):
+                return
+            self.__resolved[job] = future.result()
+            self.__resolved.move_to_end(job)
+            while len(self.__resolved) > self.RESOLVED:
+                self.__resolved.popitem(last=False)
+
+    def __isResolved(self, result: Any) -> bool:
+        if isinstance(result, tuple):
+            return all(r is not None for r in result)
+        return result is not None
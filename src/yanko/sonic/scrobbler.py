@@ -0,0 +1,221 @@
+import logging
+import time
+from queue import Empty, Queue
+from typing import Any, Callable, Optional
+from pydantic import BaseModel
+from requests.exceptions import RequestException
+from yanko.core.thread import StoppableThread
+from yanko.db.base import YankoDb
+from yanko.db.models import Scrobble as ScrobbleModel
+from yanko.sonic.session import Session
+
+
+class Scrobble(BaseModel):
+    id: str
+    time: int
+    submission: bool = True
+
+
+class ScrobblerStats(BaseModel):
+    queued: int = 0
+    recorded: int = 0
+    flushed: int = 0
+    now_playing: int = 0
+    failed: int = 0
+    dropped: int = 0
+
+
+class ScrobblerMeta(type):
+
+    __instance: Optional["Scrobbler"] = None
+
+    def __call__(cls, *args: Any, **kwds: Any) -> Any:
+        if not cls.__instance:
+            cls.__instance = type.__call__(cls, *args, **kwds)
+        return cls.__instance
+
+    def register(
+        cls,
+        url_factory: Callable[..., str],
+        on_submit: Optional[Callable[[], None]] = None
+    ) -> "Scrobbler":
+        scrobbler = cls()
+        scrobbler.url_factory = url_factory
+        scrobbler.on_submit = on_submit
+        if not scrobbler.is_alive():
+            scrobbler.start()
+        return scrobbler
+
+    def now_playing(cls, song_id: str):
+        cls().queue.put_nowait(
+            Scrobble(id=song_id, time=int(time.time() * 1000), submission=False)
+        )
+
+    def played(cls, song_id: str, started: float):
+        cls().queue.put_nowait(
+            Scrobble(id=song_id, time=int(started * 1000), submission=True)
+        )
+
+    def should_submit(cls, duration: float, played: float) -> bool:
+        if not duration or duration <= cls.MIN_DURATION:
+            return False
+        return played >= min(duration / 2, cls.MIN_PLAYED)
+
+    @property
+    def stats(cls) -> ScrobblerStats:
+        return cls().get_stats()
+
+
+class Scrobbler(StoppableThread, metaclass=ScrobblerMeta):
+    """Scrobble journal.
+
+    Now-playing and completed plays are recorded in the Scrobble table
+    with the time they happened and deleted once the server accepted
+    them. Completed plays are submitted in batches of id/time pairs and
+    stay in the journal until then, across restarts and outages, with a
+    growing retry delay. Only the latest now-playing event is sent and
+    only while it is still recent, older ones are dropped."""
+
+    BATCH_SIZE = 50
+    RETRY_DELAY = 15
+    MAX_RETRY_DELAY = 600
+    NOW_PLAYING_TTL = 600
+    MIN_PLAYED = 240
+    MIN_DURATION = 30
+
+    url_factory: Optional[Callable[..., str]] = None
+    on_submit: Optional[Callable[[], None]] = None
+
+    def __init__(self, *args, **kwargs):
+        self.queue: Queue = Queue()
+        self.__stats = ScrobblerStats()
+        self.__delay = 0
+        super().__init__(*args, **kwargs)
+
+    def stop(self):
+        super().stop()
+        self.queue.put_nowait(None)
+
+    def get_stats(self) -> ScrobblerStats:
+        return self.__stats.copy()
+
+    def run(self):
+        YankoDb.db.create_tables([ScrobbleModel], safe=True)
+        self.__count()
+        while not self.stopped():
+            try:
+                item = self.queue.get(
+                    timeout=self.__delay if self.__stats.queued else None
+                )
+                if item is None:
+                    break
+                self.__collect(item)
+            except Empty:
+                pass
+            self.__flush()
+
+    def __collect(self, item: Scrobble):
+        items = [item]
+        while True:
+            try:
+                item = self.queue.get_nowait()
+                if item is None:
+                    self.stop()
+                    break
+                items.append(item)
+            except Empty:
+                break
+        with YankoDb.db.atomic():
+            for item in items:
+                self.__record(item)
+        self.__count()
+
+    def __record(self, item: Scrobble):
+        ScrobbleModel.insert(
+            song_id=item.id,
+            played=item.time,
+            submission=item.submission,
+        ).execute()
+        self.__stats.recorded += 1
+
+    def __count(self):
+        self.__stats.queued = ScrobbleModel.select().count()
+
+    def __flush(self):
+        if not self.__stats.queued or not self.url_factory:
+            return
+        self.__announce()
+        submitted = self.__submit()
+        self.__count()
+        if submitted:
+            logging.debug(f"scrobbled {submitted} -> {self.__stats}")
+            if self.on_submit:
+                self.on_submit()
+
+    def __announce(self):
+        events = list(
+            ScrobbleModel.select()
+            .where(ScrobbleModel.submission == False)  # noqa: E712
+            .order_by(ScrobbleModel.played.desc())
+        )
+        if not events:
+            return
+        latest, stale = events[0], events[1:]
+        if time.time() * 1000 - latest.played > self.NOW_PLAYING_TTL * 1000:
+            stale.append(latest)
+        elif self.__send([latest], submission=False):
+            self.__stats.now_playing += 1
+            latest.delete_instance()
+        if stale:
+            ScrobbleModel.delete().where(
+                ScrobbleModel.id.in_([e.id for e in stale])
+            ).execute()
+            self.__stats.dropped += len(stale)
+
+    def __submit(self) -> int:
+        submitted = 0
+        while not self.stopped():
+            batch = list(
+                ScrobbleModel.select()
+                .where(ScrobbleModel.submission == True)  # noqa: E712
+                .order_by(ScrobbleModel.played)
+                .limit(self.BATCH_SIZE)
+            )
+            if not batch:
+                break
+            ids = [e.id for e in batch]
+            if not self.__send(batch, submission=True):
+                ScrobbleModel.update(attempts=ScrobbleModel.attempts + 1).where(
+                    ScrobbleModel.id.in_(ids)
+                ).execute()
+                break
+            ScrobbleModel.delete().where(ScrobbleModel.id.in_(ids)).execute()
+            submitted += len(batch)
+            self.__stats.flushed += len(batch)
+        return submitted
+
+    def __send(self, events: list[ScrobbleModel], submission: bool) -> bool:
+        assert self.url_factory
+        try:
+            url = self.url_factory(
+                id=[e.song_id for e in events],
+                time=[e.played for e in events],
+                submission=str(submission).lower(),
+            )
+            resp = Session.get(url)
+            resp.raise_for_status()
+            status = resp.json().get("subsonic-response", {}).get("status")
+            assert status == "ok"
+            self.__delay = 0
+            return True
+        except (RequestException, ValueError, AssertionError) as e:
+            self.__stats.failed += 1
+            self.__delay = min(
+                max(self.__delay * 2, self.RETRY_DELAY),
+                self.MAX_RETRY_DELAY
+            )
+            logging.warning(
+                f"scrobble failed, {self.__stats.queued} queued, "
+                f"retry in {self.__delay}s: {e}"
+            )
+            return False
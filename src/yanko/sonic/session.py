@@ -0,0 +1,127 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Optional
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from pydantic import BaseModel
+from yanko.core.config import app_config
+
+
+class SessionConfig(BaseModel):
+    pool_size: int = 10
+    fanout: int = 8
+    retries: int = 3
+    backoff: float = 0.3
+    timeout: float = 10
+    timeouts: dict[str, Optional[float]] = {
+        "stream": None,
+        "download": None,
+        "getCoverArt": 20,
+        "startScan": 30,
+        "search3": 5,
+    }
+
+
+class SessionStats(BaseModel):
+    requests: int
+    connections: int
+
+    @property
+    def reused(self) -> int:
+        return max(0, self.requests - self.connections)
+
+
+class SessionMeta(type):
+
+    _instance: Optional["Session"] = None
+
+    def __call__(cls, *args, **kwds):
+        if not cls._instance:
+            cls._instance = type.__call__(cls, *args, **kwds)
+        return cls._instance
+
+    def get(cls, url: str, **kwargs) -> requests.Response:
+        return cls().request("get", url, **kwargs)
+
+    def gather(cls, *calls: Callable[[], Any]) -> list[Any]:
+        return cls().run_all(*calls)
+
+    @property
+    def stats(cls) -> SessionStats:
+        return cls().get_stats()
+
+
+class Session(object, metaclass=SessionMeta):
+
+    __session: requests.Session
+    __config: SessionConfig
+    __lock: Lock
+
+    def __init__(self) -> None:
+        self.__config = SessionConfig(
+            **app_config.get("server", {}).get("session", {})
+        )
+        self.__lock = Lock()
+        retry = Retry(
+            total=self.__config.retries,
+            backoff_factor=self.__config.backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.__config.pool_size,
+            pool_maxsize=self.__config.pool_size,
+            max_retries=retry,
+        )
+        self.__session = requests.Session()
+        self.__session.mount("https://", adapter)
+        self.__session.mount("http://", adapter)
+        self.__adapter = adapter
+        self.__executor = ThreadPoolExecutor(
+            max_workers=self.__config.fanout,
+            thread_name_prefix="fanout"
+        )
+
+    def timeout(self, url: str) -> Optional[float]:
+        endpoint = urlparse(url).path.split("/")[-1]
+        return self.__config.timeouts.get(endpoint, self.__config.timeout)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout(url))
+        return self.__session.request(method=method, url=url, **kwargs)
+
+    def run_all(self, *calls: Callable[[], Any]) -> list[Any]:
+        """Runs independent calls concurrently over the shared pool.
+
+        The first call runs on the calling thread, the rest on the fan-out
+        executor, so the whole batch takes as long as its slowest call.
+        Results keep the order of the calls and the first exception raised
+        by any of them is re-raised. Calls must not gather themselves."""
+        if not calls:
+            return []
+        futures = [self.__executor.submit(call) for call in calls[1:]]
+        first = calls[0]()
+        return [first, *[f.result() for f in futures]]
+
+    def get_stats(self) -> SessionStats:
+        requests_count, connections = 0, 0
+        with self.__lock:
+            pools = self.__adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                try:
+                    pool = pools[key]
+                    requests_count += pool.num_requests
+                    connections += pool.num_connections
+                except KeyError:
+                    pass
+        return SessionStats(requests=requests_count, connections=connections)
+
+    def log_stats(self, name: str = "session"):
+        stats = self.get_stats()
+        logging.debug(
+            f"{name} -> requests: {stats.requests}, "
+            f"connections: {stats.connections}, reused: {stats.reused}"
+        )
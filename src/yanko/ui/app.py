@@ -1,3 +1,4 @@
+from datetime import datetime, timedelta, timezone
 from queue import Empty, Queue
 import pyperclip3 as pc
 from threading import Thread
@@ -6,6 +7,7 @@ import logging
 from rumps import rumps
 from yanko.player.bpm import BeatsStruct
 from yanko.player.device import Device
+from yanko.player.engine import Engine
 from yanko.api.server import Server
 from yanko.lametric import LaMetric, StatusFrame
 from yanko.sonic import (
@@ -15,11 +17,15 @@ from yanko.sonic import (
     LastAdded,
     MostPlayed,
     NowPlaying,
+    PlaybackPosition,
+    SongInfo,
     Playlist,
     Playstatus,
     RecentlyPlayed,
     ScanStatus,
     Search,
+    SearchDone,
+    SearchIcon,
     Share,
     Status,
     VolumeStatus,
@@ -95,6 +101,7 @@ class YankoApp(rumps.App, metaclass=YankoAppMeta):
             nosleep=True,
         )
         Device.register()
+        Engine.register()
         self.__status = Status.LOADING
         self.__initCommands = [
             (Command.LAST_ADDED, LastAdded),
@@ -246,14 +253,42 @@ class YankoApp(rumps.App, metaclass=YankoAppMeta):
         try:
             assert self.__nowplaying
             assert self.__nowplaying.track.path == resp.path
+            assert self.__nowplaying.beats is None or (
+                self.__nowplaying.beats.partial or not resp.partial
+            )
             self.__nowplaying.beats = resp
             self.__bpm.now_playing = self.__nowplaying
+            self.__bpm.seek()
             it = self.menu.get(self.__nowPlayingSection[0])
             assert isinstance(it, NowPlayingItem)
             it.update_bpm(self.__nowplaying)
         except (AssertionError, AttributeError):
             pass
 
+    def _onSongInfo(self, resp: SongInfo):
+        try:
+            assert self.__nowplaying
+            assert self.__nowplaying.track.id == resp.song.id
+            bpm = self.__nowplaying.bpm
+            self.__nowplaying.song = resp.song
+            assert self.__nowplaying.bpm != bpm
+            self.__bpm.now_playing = self.__nowplaying
+            it = self.menu.get(self.__nowPlayingSection[0])
+            assert isinstance(it, NowPlayingItem)
+            it.update_bpm(self.__nowplaying)
+        except (AssertionError, AttributeError, IndexError):
+            pass
+
+    def _onPlaybackPosition(self, resp: PlaybackPosition):
+        try:
+            assert self.__nowplaying
+            self.__nowplaying.start = datetime.now(tz=timezone.utc) - timedelta(
+                seconds=resp.position
+            )
+            self.__bpm.seek()
+        except (AssertionError, AttributeError):
+            pass
+
     def _onShare(self, resp: Share):
         try:
             assert resp
@@ -264,17 +299,24 @@ class YankoApp(rumps.App, metaclass=YankoAppMeta):
 
     def _onLaMetricInit(self):
         try:
-            LaMetric.status(status=self.__status)
+            position = self.position
+            LaMetric.status(status=self.__status, position=position)
             if self.__status in [Status.PLAYING] and self.__nowplaying:
                 track = self.__nowplaying.track
                 assert track.coverArt
                 LaMetric.nowplaying(f"{track.artist} / {track.title}", track.coverArt)
-            return StatusFrame(status=self.__status.value).dict()
+            return StatusFrame(status=self.__status.value, position=position).dict()
         except AssertionError as e:
             logging.debug(e)
 
     def _onSearch(self, resp: Search):
-        Server.queue(resp.queue_id).put_nowait(resp.dict())
+        Server.respond(resp.queue_id, resp.dict())
+
+    def _onSearchIcon(self, resp: SearchIcon):
+        Server.respond(resp.queue_id, resp.dict())
+
+    def _onSearchDone(self, resp: SearchDone):
+        Server.respond(resp.queue_id, resp.dict())
 
     def _onPlaylist(self, resp: Playlist):
         list = resp.tracks
@@ -302,9 +344,16 @@ class YankoApp(rumps.App, metaclass=YankoAppMeta):
         if not sender.scanning:
             self.manager.commander.put_nowait((Command.LAST_ADDED, None))
 
+    @property
+    def position(self) -> Optional[float]:
+        if not self.__nowplaying or self.__status not in [Status.PLAYING, Status.PAUSED]:
+            return None
+        return self.__nowplaying.position
+
     def _onPlaystatus(self, resp: Playstatus):
         self.__status = resp.status
-        LaMetric.status(resp.status)
+        self.__bpm.wake()
+        LaMetric.status(resp.status, self.position)
         match resp.status:
             case Status.PAUSED:
                 self.icon = Symbol.PAUSE.value
@@ -369,6 +418,7 @@ class YankoApp(rumps.App, metaclass=YankoAppMeta):
             except Exception:
                 pass
         try:
+            Engine.close()
             rumps.quit_application()
             pid_file.unlink(missing_ok=True)
         except Exception:
@@ -1,8 +1,10 @@
 from queue import Queue
 from threading import Event
-from time import sleep, time
+from time import time
 from typing import Optional
-from yanko.player.device import Device
+import numpy as np
+from yanko.player.engine import Engine
+from yanko.player.scheduler import BeatScheduler
 import logging
 from yanko.core.thread import StoppableThread
 from yanko.sonic import NowPlaying
@@ -28,22 +30,30 @@ class BPMEvent(BaseModel):
 
 
 class BPM(StoppableThread):
+    """Beat animation.
+
+    The beats live in a BeatScheduler that sleeps until the next one is due
+    on the engine clock, the position of the sample the device is playing,
+    so pauses, underruns and buffering hold the beats back with the audio.
+    Seeks and resumes re-index the scheduler instead of filtering the beat
+    list."""
+
+    PAUSE_BLINK = 1.0
+    IDLE_WAIT = 0.5
 
     time_event: Event
     __ui_queue: Queue
     __now_playing: Optional[NowPlaying] = None
-    __time_start: float = 0
-    __time_paused: float = 0
-    __time_current: float = 0
+    __position: float = 0
+    __playing: bool = False
     __time_total: float = 0
     __bpm: int = 0
-    __beats: Optional[list[float]] = None
-    __last_measure: float = 0
     __beat_count: int = 0
 
     def __init__(self, ui_queue: Queue, *args, **kwargs):
         self.time_event = Event()
         self.__ui_queue = ui_queue
+        self.__scheduler = BeatScheduler(clock=self.position)
         super().__init__(*args, **kwargs)
 
     @property
@@ -51,59 +61,68 @@ class BPM(StoppableThread):
         return self.__now_playing
 
     @now_playing.setter
-    def now_playing(self, np: NowPlaying):
-        self.__now_playing = np
-        self.__time_start = 0
-        self.__time_current = 0
-        self.__time_paused = 0
-        self.__time_total = np.track.duration
-        self.__last_measure = 0
-        self.__bpm = np.bpm
-        self.__beats = np.extracted_beats
-        self.__beat_count = 1
-        if self.__beats:
-            total_beats = len(self.__beats)
+    def now_playing(self, playing: NowPlaying):
+        self.__now_playing = playing
+        self.__position = 0
+        self.__playing = False
+        self.__time_total = playing.track.duration
+        self.__bpm = playing.bpm
+        self.__beat_count = 0
+        beats = playing.extracted_beats
+        if beats and playing.beats and playing.beats.partial:
+            static = self.get_static_beats()
+            beats = np.concatenate([beats, static[static > beats[-1]]])
+        elif beats:
+            total_beats = len(beats)
             beats_bmp = total_beats / (self.__time_total / 60)
-            np.setBpm(int(beats_bmp))
+            playing.setBpm(int(beats_bmp))
         else:
-            self.__beats = self.get_static_beats()
+            beats = self.get_static_beats()
+        self.__scheduler.load(beats)
+
+    def position(self) -> float:
+        position = Engine.position
+        if position is not None:
+            self.__position = position
+        return self.__position
+
+    def seek(self):
+        self.__scheduler.reindex()
+        self.__beat_count = self.__scheduler.cursor
 
-    def get_static_beats(self):
-        bps = self.__bpm / 60
-        return [round(x / bps, 2) for x in range(0, int(self.__time_total * bps))]
+    def wake(self):
+        self.__scheduler.wake()
+
+    def get_static_beats(self) -> np.ndarray:
+        if not self.__bpm:
+            return np.empty(0, dtype=np.float64)
+        return np.arange(0, self.__time_total, 60 / self.__bpm)
 
     def run(self):
         while not self.stopped():
             try:
-                if not self.__beats:
-                    sleep(0.5)
+                if not len(self.__scheduler):
+                    self.__scheduler.wait(self.IDLE_WAIT)
                 elif not self.time_event.is_set():
-                    if self.__time_start is not None:
-                        if self.__last_measure:
-                            self.__time_paused += time() - self.__last_measure
-                        if round(self.__time_paused) in self.__beats:
-                            self.__addToQueue(icon=next(PausingIcon).value)
-                        self.__last_measure = time()
+                    self.__pause()
+                    if not self.time_event.wait(self.PAUSE_BLINK):
+                        self.__addToQueue(icon=next(PausingIcon).value)
                 else:
-                    if not self.__time_start:
-                        self.__time_start = time() + Device.latency
-                    self.__time_current = (
-                        time() - self.__time_start - self.__time_paused
-                    )
-                    self.__last_measure = None
-                    if self.__time_total < self.__time_current:
-                        logging.debug(
-                            f"current time {self.__time_current:.2f} outside durection {self.__time_total} "
-                        )
-                    delta = abs(self.__time_current - self.__beats[0])
-                    if round(delta) < 0.07:
+                    self.__resume()
+                    beat_idx = self.__scheduler.next_beat()
+                    if beat_idx is not None and self.time_event.is_set():
+                        self.__beat_count = beat_idx + 1
                         self.__addToQueue(next(PlayingIcon).value)
-                        self.__beats.pop(0)
-                        self.__beat_count += 1
             except Exception as e:
                 logging.error(e, exc_info=True)
-            finally:
-                sleep(0.1)
+
+    def __pause(self):
+        self.__playing = False
+
+    def __resume(self):
+        if not self.__playing:
+            self.__playing = True
+            self.seek()
 
     def __addToQueue(self, icon):
         self.__ui_queue.put_nowait(
@@ -111,7 +130,7 @@ class BPM(StoppableThread):
                 icon=icon,
                 beat_no=self.__beat_count,
                 tempo=str(self.__bpm),
-                time_elapsed=int(self.__time_current),
+                time_elapsed=int(self.position()),
                 expires=time() + 0.14,
             )
         )